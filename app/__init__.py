@@ -2,23 +2,28 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_bcrypt import Bcrypt
-from flask_migrate import Migrate
 from config import Config
+from app.routing import RoutingSession
 import os
 
 # Initialize extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})  # Routes read-only views to replicas
 login_manager = LoginManager()
 bcrypt = Bcrypt()
-migrate = Migrate()
 
-def create_app():
+def create_app(config_class=Config):
     app = Flask(__name__)
-    app.config.from_object(Config)
+    app.config.from_object(config_class)
+    # Derived here rather than in Config, so a subclass that only changes the URI moves the archive too
+    app.config['SQLALCHEMY_BINDS'] = {'archive': app.config['SQLALCHEMY_DATABASE_URI'],
+                                      **app.config['SQLALCHEMY_BINDS']}
 
     # Initialize extensions
     db.init_app(app)
-    migrate.init_app(app, db)  # Pass the app and db to migrate
+    if app.config['INIT_MIGRATIONS']:
+        # Alembic is slow to import and only needed by the `flask db` commands
+        from flask_migrate import Migrate
+        Migrate(app, db)
     login_manager.init_app(app)
     bcrypt.init_app(app)
 
@@ -36,6 +41,22 @@ def create_app():
     app.register_blueprint(customer_bp)
     app.register_blueprint(professional_bp)
 
+    # Rate limits run before every view, ahead of any database work
+    from app.ratelimit import init_rate_limits
+    init_rate_limits(app)
+
+    # Duplicate POSTs carrying an idempotency key are answered from memory
+    from app.idempotency import init_idempotency
+    init_idempotency(app)
+
+    # Compress large HTML/JSON responses; serve fingerprinted static files with immutable caching
+    from app.compression import init_compression
+    init_compression(app)
+
+    # Register CLI commands
+    from app.cli import register_commands
+    register_commands(app)
+
     # Ensure upload folder exists
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
@@ -0,0 +1,168 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from flask import current_app
+
+from app import db
+from app.models import ArchivedServiceRequest, Service, ServiceCategory, ServiceRequest
+
+# Statuses that count as delivered work (revenue is only booked for these)
+DONE_STATUSES = ['completed', 'closed']
+
+# Cached results keyed by (scope, start, end) -> (expires_at, result), oldest first
+_cache = {}
+MAX_CACHE_ENTRIES = 256
+_cache_lock = threading.Lock()
+
+
+def get_trends(scope, days=365, end=None):
+    """Return chart-ready trend data for ``scope`` over the last ``days`` days.
+
+    ``scope`` is ``('admin',)``, ``('customer', user_id)`` or
+    ``('professional', user_id)``. Results are cached per (scope, range) for
+    ``ANALYTICS_CACHE_SECONDS``.
+    """
+    end = (end or datetime.utcnow()).date() + timedelta(days=1)
+    start = end - timedelta(days=days)
+    key = (tuple(scope), start, end)
+
+    now = time.monotonic()
+    cached = _cache.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    frame = load_frame(scope, start, end)
+    result = {
+        'range': {'start': start.isoformat(), 'end': (end - timedelta(days=1)).isoformat()},
+        'daily': _series(frame, start, end, 'D'),
+        'weekly': _series(frame, start, end, 'W-MON'),
+        'percentiles': lifecycle_percentiles(frame),
+        'category_time_to_accept': category_percentiles(frame, 'to_accept'),
+        'category_revenue': category_revenue(frame),
+    }
+    _store(key, now + current_app.config['ANALYTICS_CACHE_SECONDS'], result, now)
+    return result
+
+
+def _store(key, expires_at, result, now):
+    # Keys vary with the day and the requested range, so drop expired entries and cap the rest
+    with _cache_lock:
+        for stale in [stale for stale, (expires, _) in _cache.items() if expires <= now]:
+            del _cache[stale]
+        _cache.pop(key, None)
+        _cache[key] = (expires_at, result)
+        while len(_cache) > MAX_CACHE_ENTRIES:
+            del _cache[next(iter(_cache))]
+
+
+def invalidate_cache():
+    _cache.clear()
+
+
+def load_frame(scope, start, end):
+    # Pull every column the charts need in a single query, straight into arrays
+    query = db.session.query(
+        ServiceRequest.status,
+        ServiceRequest.created_at,
+        ServiceRequest.accepted_at,
+        ServiceRequest.completed_at,
+        Service.base_price,
+        ServiceCategory.name,
+    ).join(Service, ServiceRequest.service_id == Service.id) \
+        .join(ServiceCategory, Service.category_id == ServiceCategory.id) \
+        .filter(ServiceRequest.created_at >= start, ServiceRequest.created_at < end)
+
+    # Archived requests carry their own price and category snapshot
+    archived = db.session.query(
+        ArchivedServiceRequest.status,
+        ArchivedServiceRequest.created_at,
+        ArchivedServiceRequest.accepted_at,
+        ArchivedServiceRequest.completed_at,
+        ArchivedServiceRequest.base_price,
+        ArchivedServiceRequest.category_name,
+    ).filter(ArchivedServiceRequest.created_at >= start, ArchivedServiceRequest.created_at < end)
+
+    if scope[0] == 'customer':
+        query = query.filter(ServiceRequest.customer_id == scope[1])
+        archived = archived.filter(ArchivedServiceRequest.customer_id == scope[1])
+    elif scope[0] == 'professional':
+        query = query.filter(ServiceRequest.professional_id == scope[1])
+        archived = archived.filter(ArchivedServiceRequest.professional_id == scope[1])
+
+    columns = ['status', 'created_at', 'accepted_at', 'completed_at', 'base_price', 'category']
+    frame = pd.DataFrame.from_records(query.all() + archived.all(), columns=columns)
+    for column in ('created_at', 'accepted_at', 'completed_at'):
+        frame[column] = pd.to_datetime(frame[column])
+    frame['base_price'] = frame['base_price'].astype(float)
+    frame['done'] = frame['status'].isin(DONE_STATUSES).to_numpy()
+    frame['to_accept'] = _hours(frame['accepted_at'], frame['created_at'])
+    frame['to_complete'] = _hours(frame['completed_at'], frame['created_at'])
+    return frame
+
+
+def _series(frame, start, end, freq):
+    # Gap-filled request counts and revenue, plus a rolling mean over each
+    index = pd.date_range(start, end - timedelta(days=1), freq='D')
+    requests = frame.groupby(frame['created_at'].dt.floor('D')).size()
+    requests = requests.reindex(index, fill_value=0)
+
+    done = frame[frame['done']]
+    revenue = done.groupby(done['completed_at'].dt.floor('D'))['base_price'].sum()
+    revenue = revenue.reindex(index, fill_value=0.0)
+
+    if freq != 'D':
+        requests = requests.resample(freq, label='left', closed='left').sum()
+        revenue = revenue.resample(freq, label='left', closed='left').sum()
+        # The first week starts on the Monday before the range; label it with the range's first day
+        first = requests.index.where(requests.index >= index[0], index[0])
+        requests.index = revenue.index = first
+    window = 7 if freq == 'D' else 4
+
+    return {
+        'labels': [day.strftime('%Y-%m-%d') for day in requests.index],
+        'requests': requests.astype(int).tolist(),
+        'requests_rolling': requests.rolling(window, min_periods=1).mean().round(2).tolist(),
+        'revenue': revenue.round(2).tolist(),
+        'revenue_rolling': revenue.rolling(window, min_periods=1).mean().round(2).tolist(),
+    }
+
+
+def lifecycle_percentiles(frame):
+    return {
+        'time_to_accept_hours': _percentiles(frame['to_accept'].to_numpy()),
+        'time_to_complete_hours': _percentiles(frame['to_complete'].to_numpy()),
+    }
+
+
+def category_percentiles(frame, column):
+    return {
+        category: _percentiles(values.to_numpy())
+        for category, values in frame.groupby('category')[column]
+    }
+
+
+def category_revenue(frame):
+    done = frame[frame['done']]
+    totals = done.groupby('category')['base_price'].sum().sort_values(ascending=False)
+    return {category: round(float(total), 2) for category, total in totals.items()}
+
+
+def _hours(end, start):
+    # NaN where the request never reached that stage
+    return (end - start).dt.total_seconds().to_numpy(dtype=float) / 3600.0
+
+
+def _percentiles(values):
+    values = values[np.isfinite(values)]
+    if values.size == 0:
+        return {'count': 0, 'p50': None, 'p90': None, 'p95': None}
+    p50, p90, p95 = np.percentile(values, [50, 90, 95])
+    return {
+        'count': int(values.size),
+        'p50': round(float(p50), 2),
+        'p90': round(float(p90), 2),
+        'p95': round(float(p95), 2),
+    }
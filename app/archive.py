@@ -0,0 +1,193 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import aliased
+
+from app import db
+from app.models import (
+    ArchivedRejection, ArchivedServiceRequest, RejectedRequest, Service, ServiceCategory,
+    ServiceRequest, User, rejected_requests_association
+)
+
+Customer = aliased(User)
+Professional = aliased(User)
+
+REQUEST_COLUMNS = [
+    'id', 'customer_id', 'professional_id', 'service_id', 'status', 'created_at',
+    'accepted_at', 'completed_at', 'rating', 'review', 'updated_at'
+]
+
+
+def archive_closed_requests(older_than_days=None, batch_size=None):
+    """Move closed requests older than ``older_than_days`` into the archive, one batch per transaction.
+
+    Returns the number of requests moved.
+    """
+    if older_than_days is None:
+        older_than_days = current_app.config['ARCHIVE_AFTER_DAYS']
+    if batch_size is None:
+        batch_size = current_app.config['ARCHIVE_BATCH_SIZE']
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+    archived = 0
+    while True:
+        moved, scanned = _archive_batch(cutoff, batch_size)
+        archived += moved
+        if scanned < batch_size:
+            return archived
+
+
+def _archive_batch(cutoff, batch_size):
+    rows = db.session.execute(
+        select(
+            *[getattr(ServiceRequest, column) for column in REQUEST_COLUMNS],
+            Service.name.label('service_name'),
+            Service.category_id,
+            ServiceCategory.name.label('category_name'),
+            Service.base_price,
+            Customer.fullname.label('customer_name'),
+            Professional.fullname.label('professional_name'),
+        )
+        .join(Service, ServiceRequest.service_id == Service.id)
+        .join(ServiceCategory, Service.category_id == ServiceCategory.id)
+        .join(Customer, ServiceRequest.customer_id == Customer.id)
+        .outerjoin(Professional, ServiceRequest.professional_id == Professional.id)
+        .where(
+            ServiceRequest.status == 'closed',
+            func.coalesce(ServiceRequest.completed_at, ServiceRequest.updated_at) < cutoff
+        )
+        .order_by(ServiceRequest.id)
+        .limit(batch_size)
+    ).all()
+    if not rows:
+        return 0, 0
+
+    ids = [row.id for row in rows]
+    rejections = set(db.session.execute(
+        select(RejectedRequest.request_id, RejectedRequest.professional_id)
+        .where(RejectedRequest.request_id.in_(ids))
+    ).all())
+    rejections |= set(db.session.execute(
+        select(rejected_requests_association.c.service_request_id, rejected_requests_association.c.professional_id)
+        .where(rejected_requests_association.c.service_request_id.in_(ids))
+    ).all())
+    # End the read transaction: the archive may share the SQLite file and needs the write lock
+    db.session.rollback()
+
+    if db.engines['archive'].url == db.engine.url:
+        # The archive is the main database: copy and delete in one transaction on its engine, so
+        # no summary ever counts a request both live and archived
+        bind = {'bind': db.engine}
+        _copy_to_archive(ids, rows, rejections, bind)
+        moved, kept = _delete_originals(ids)
+        _drop_from_archive(kept, bind)
+        db.session.commit()
+    else:
+        # A separate archive file cannot join that transaction, so the copy commits first. Until
+        # the delete commits, summaries count the batch twice; if the run dies in between, that
+        # lasts until the next run skips the copied rows and deletes the originals.
+        _copy_to_archive(ids, rows, rejections, {'bind': db.engines['archive']})
+        db.session.commit()
+        moved, kept = _delete_originals(ids)
+        db.session.commit()
+        if kept:
+            _drop_from_archive(kept, {'bind': db.engines['archive']})
+            db.session.commit()
+    return len(moved), len(rows)
+
+
+def _copy_to_archive(ids, rows, rejections, bind):
+    # Rows left behind by an interrupted run are skipped
+    existing = set(db.session.scalars(
+        select(ArchivedServiceRequest.id).where(ArchivedServiceRequest.id.in_(ids)), bind_arguments=bind
+    ))
+    records = [row._asdict() for row in rows if row.id not in existing]
+    # Core inserts on the tables: the ORM's bulk insert picks its connection by mapper and ignores the bind
+    if records:
+        db.session.execute(insert(ArchivedServiceRequest.__table__), records, bind_arguments=bind)
+        rejected = [
+            {'request_id': request_id, 'professional_id': professional_id}
+            for request_id, professional_id in rejections if request_id not in existing
+        ]
+        if rejected:
+            db.session.execute(insert(ArchivedRejection.__table__), rejected, bind_arguments=bind)
+
+
+def _delete_originals(ids):
+    # Unless an admin re-opened one in the meantime; returns the moved and the kept ids
+    db.session.execute(
+        delete(ServiceRequest).where(ServiceRequest.id.in_(ids), ServiceRequest.status == 'closed'),
+        execution_options={'synchronize_session': False}
+    )
+    kept = set(db.session.scalars(select(ServiceRequest.id).where(ServiceRequest.id.in_(ids))))
+    moved = [request_id for request_id in ids if request_id not in kept]
+    db.session.execute(delete(RejectedRequest).where(RejectedRequest.request_id.in_(moved)))
+    db.session.execute(
+        delete(rejected_requests_association)
+        .where(rejected_requests_association.c.service_request_id.in_(moved))
+    )
+    return moved, kept
+
+
+def _drop_from_archive(ids, bind):
+    if ids:
+        db.session.execute(delete(ArchivedServiceRequest).where(ArchivedServiceRequest.id.in_(ids)),
+                           bind_arguments=bind)
+        db.session.execute(delete(ArchivedRejection).where(ArchivedRejection.request_id.in_(ids)),
+                           bind_arguments=bind)
+
+
+# Summary helpers: the live queries only see service_request, so add these in to keep totals whole
+
+def _archived(query, customer_id=None, professional_id=None, category_id=None):
+    if customer_id is not None:
+        query = query.filter(ArchivedServiceRequest.customer_id == customer_id)
+    if professional_id is not None:
+        query = query.filter(ArchivedServiceRequest.professional_id == professional_id)
+    if category_id is not None:
+        query = query.filter(ArchivedServiceRequest.category_id == category_id)
+    return query
+
+
+def archived_count(**filters):
+    return _archived(db.session.query(func.count(ArchivedServiceRequest.id)), **filters).scalar() or 0
+
+
+def archived_totals(**filters):
+    # Request count, billed total, and the sum/count of ratings
+    count, revenue, rating_sum, rating_count = _archived(db.session.query(
+        func.count(ArchivedServiceRequest.id),
+        func.coalesce(func.sum(ArchivedServiceRequest.base_price), 0),
+        func.coalesce(func.sum(ArchivedServiceRequest.rating), 0),
+        func.count(ArchivedServiceRequest.rating),
+    ), **filters).one()
+    return {'count': count, 'revenue': revenue, 'rating_sum': rating_sum, 'rating_count': rating_count}
+
+
+def archived_counts_by(column, since=None, **filters):
+    query = _archived(db.session.query(column, func.count(ArchivedServiceRequest.id)), **filters)
+    if since is not None:
+        query = query.filter(ArchivedServiceRequest.created_at >= since)
+    return dict(query.group_by(column).all())
+
+
+def archived_sums_by(column, value, **filters):
+    query = _archived(db.session.query(column, func.sum(value)), **filters)
+    return dict(query.group_by(column).all())
+
+
+def archived_ratings_by(column, **filters):
+    # {key: (rating_sum, rating_count)} over rated archived requests
+    query = _archived(db.session.query(
+        column, func.sum(ArchivedServiceRequest.rating), func.count(ArchivedServiceRequest.rating)
+    ), **filters).filter(ArchivedServiceRequest.rating.isnot(None))
+    return {key: (rating_sum, rating_count) for key, rating_sum, rating_count in query.group_by(column).all()}
+
+
+def merge_counts(*counts):
+    merged = Counter()
+    for count in counts:
+        merged.update({key: value for key, value in count.items() if value})
+    return dict(merged)
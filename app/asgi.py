@@ -0,0 +1,413 @@
+import asyncio
+import contextlib
+import json
+from datetime import datetime, timedelta
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from itsdangerous import BadSignature
+from sqlalchemy import and_, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import aliased
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+from app import db
+from app.archive import merge_counts
+from app.geo import nearby_pin_codes
+from app.models import ArchivedServiceRequest, RejectedRequest, Service, ServiceCategory, ServiceRequest, User
+
+# Async drivers used for the read-only endpoints, keyed by the sync dialect name. Others need
+# ASYNC_SQLALCHEMY_DATABASE_URI.
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+ACTIVE_STATUSES = ['accepted', 'in_progress', 'completed', 'closed']
+FINISHED_STATUSES = ['completed', 'closed']
+
+Customer = aliased(User)
+
+
+def create_asgi_app(flask_app):
+    """Wrap ``flask_app`` in an ASGI app.
+
+    Read-heavy dashboard, search, summary and feed endpoints are served
+    natively under ``/async`` as JSON, with async SQLAlchemy sessions;
+    everything else (including the HTML versions of those pages) falls
+    through to the unchanged Flask blueprints, which run in a thread pool.
+    """
+    with flask_app.app_context():
+        url = flask_app.config.get('ASYNC_SQLALCHEMY_DATABASE_URI') or _async_url(db.engine.url)
+        archive_url = db.engines['archive'].url
+        shared_archive = archive_url == db.engine.url
+    engine = create_async_engine(url)
+    # Archived requests share the main engine unless the 'archive' bind points elsewhere
+    archive_engine = engine if shared_archive else create_async_engine(_async_url(archive_url))
+    sessions = async_sessionmaker(engine, expire_on_commit=False,
+                                  binds={ArchivedServiceRequest: archive_engine})
+    poll_seconds = flask_app.config['ASYNC_FEED_POLL_SECONDS']
+
+    @sync_to_async(thread_sensitive=False)
+    def nearby(pin_code, radius_km):
+        # The pin-code index is loaded from disk on first use, so keep it off the event loop
+        with flask_app.app_context():
+            return nearby_pin_codes(pin_code, radius_km)
+
+    async def current_user(request):
+        # Reuse the Flask-Login session cookie instead of a second login flow
+        cookie = request.cookies.get(flask_app.config['SESSION_COOKIE_NAME'])
+        serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+        if not cookie or serializer is None:
+            return None
+        try:
+            data = serializer.loads(cookie, max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+        except BadSignature:
+            return None
+        if '_user_id' not in data:
+            return None
+        async with sessions() as session:
+            return await session.get(User, int(data['_user_id']))
+
+    def requires(user_type):
+        def decorator(view):
+            async def endpoint(request):
+                user = await current_user(request)
+                if user is None or user.user_type != user_type:
+                    return JSONResponse({'error': 'Access denied.'}, status_code=403)
+                return await view(request, user)
+            return endpoint
+        return decorator
+
+    @requires('admin')
+    async def admin_summary(request, user):
+        async with sessions() as session:
+            users = dict((await session.execute(
+                select(User.user_type, func.count(User.id)).group_by(User.user_type)
+            )).all())
+            status_data = dict((await session.execute(
+                select(ServiceRequest.status, func.count(ServiceRequest.id)).group_by(ServiceRequest.status)
+            )).all())
+            service_data = dict((await session.execute(
+                select(ServiceCategory.name, func.count(ServiceRequest.id))
+                .join(Service, ServiceCategory.id == Service.category_id)
+                .join(ServiceRequest, Service.id == ServiceRequest.service_id)
+                .group_by(ServiceCategory.name)
+            )).all())
+            total_services = await session.scalar(select(func.count(Service.id)))
+            archived_status = dict((await session.execute(
+                select(ArchivedServiceRequest.status, func.count(ArchivedServiceRequest.id))
+                .group_by(ArchivedServiceRequest.status)
+            )).all())
+            archived_categories = dict((await session.execute(
+                select(ArchivedServiceRequest.category_name, func.count(ArchivedServiceRequest.id))
+                .group_by(ArchivedServiceRequest.category_name)
+            )).all())
+        status_data = merge_counts(status_data, archived_status)
+        service_data = merge_counts(service_data, archived_categories)
+
+        return JSONResponse({
+            'total_customers': users.get('customer', 0),
+            'total_professionals': users.get('professional', 0),
+            'total_services': total_services,
+            'total_service_requests': sum(status_data.values()),
+            'status_data': status_data,
+            'service_data': service_data,
+        })
+
+    @requires('customer')
+    async def customer_summary(request, user):
+        # Same figures as customer_routes.summary
+        live, archived = ServiceRequest.customer_id == user.id, ArchivedServiceRequest.customer_id == user.id
+        since = datetime.utcnow() - timedelta(days=30)
+        async with sessions() as session:
+            total_services = await session.scalar(
+                select(func.count(ServiceRequest.id)).where(live, ServiceRequest.status.in_(ACTIVE_STATUSES))
+            )
+            total_expenditure = await session.scalar(
+                select(func.coalesce(func.sum(Service.base_price), 0))
+                .join(ServiceRequest, Service.id == ServiceRequest.service_id)
+                .where(live, ServiceRequest.status.in_(ACTIVE_STATUSES))
+            )
+            rating_sum, rating_count = (await session.execute(
+                select(func.coalesce(func.sum(ServiceRequest.rating), 0), func.count(ServiceRequest.rating))
+                .where(live, ServiceRequest.status.in_(FINISHED_STATUSES))
+            )).one()
+            status_data = dict((await session.execute(
+                select(ServiceRequest.status, func.count(ServiceRequest.id)).where(live)
+                .group_by(ServiceRequest.status)
+            )).all())
+            daily = func.date(ServiceRequest.created_at)
+            daily_data = dict((await session.execute(
+                select(daily, func.count(ServiceRequest.id)).where(live, ServiceRequest.created_at >= since)
+                .group_by(daily)
+            )).all())
+            ratings = (await session.execute(
+                select(User.fullname, func.sum(ServiceRequest.rating), func.count(ServiceRequest.rating))
+                .join(ServiceRequest, ServiceRequest.professional_id == User.id)
+                .where(live, ServiceRequest.rating.isnot(None)).group_by(User.fullname)
+            )).all()
+
+            # Archived requests are all closed
+            archived_count, archived_revenue, archived_rating_sum, archived_rating_count = (await session.execute(
+                select(func.count(ArchivedServiceRequest.id),
+                       func.coalesce(func.sum(ArchivedServiceRequest.base_price), 0),
+                       func.coalesce(func.sum(ArchivedServiceRequest.rating), 0),
+                       func.count(ArchivedServiceRequest.rating)).where(archived)
+            )).one()
+            archived_status = dict((await session.execute(
+                select(ArchivedServiceRequest.status, func.count(ArchivedServiceRequest.id)).where(archived)
+                .group_by(ArchivedServiceRequest.status)
+            )).all())
+            archived_daily = func.date(ArchivedServiceRequest.created_at)
+            archived_daily_data = dict((await session.execute(
+                select(archived_daily, func.count(ArchivedServiceRequest.id))
+                .where(archived, ArchivedServiceRequest.created_at >= since).group_by(archived_daily)
+            )).all())
+            archived_ratings = (await session.execute(
+                select(ArchivedServiceRequest.professional_name, func.sum(ArchivedServiceRequest.rating),
+                       func.count(ArchivedServiceRequest.rating))
+                .where(archived, ArchivedServiceRequest.rating.isnot(None))
+                .group_by(ArchivedServiceRequest.professional_name)
+            )).all()
+
+        rating_count += archived_rating_count
+        totals = {}
+        for name, ratings_sum, ratings_count in [*ratings, *archived_ratings]:
+            total_sum, total_count = totals.get(name, (0, 0))
+            totals[name] = (total_sum + ratings_sum, total_count + ratings_count)
+        return JSONResponse({
+            'total_services': total_services + archived_count,
+            'total_expenditure': total_expenditure + archived_revenue,
+            'average_rating': round((rating_sum + archived_rating_sum) / rating_count, 2) if rating_count else 0,
+            'service_status': merge_counts(status_data, archived_status),
+            'daily_services': merge_counts({str(day): count for day, count in daily_data.items()},
+                                           {str(day): count for day, count in archived_daily_data.items()}),
+            'professional_ratings': {
+                name: round(total_sum / total_count, 2) for name, (total_sum, total_count) in totals.items()
+            },
+        })
+
+    async def customer_search(request):
+        # Same query as customer_routes.search, which needs no login either
+        search_type = request.query_params.get('search_type')
+        search_query = request.query_params.get('search_query')
+        if search_type not in ('service_name', 'pin_code') or not search_query:
+            return JSONResponse({'results': []})
+
+        query = select(
+            Service.id.label('service_id'), Service.name.label('service'), Service.base_price,
+            User.id.label('professional_id'), User.fullname.label('professional'), User.pin_code, User.rating_avg
+        ).join(ServiceRequest, ServiceRequest.service_id == Service.id) \
+            .join(User, ServiceRequest.professional_id == User.id) \
+            .where(User.address.isnot(None), User.address != '', User.experience > 0)
+        if search_type == 'service_name':
+            query = query.where(Service.name.ilike(f'%{search_query}%'))
+        else:
+            query = query.where(User.pin_code.in_(
+                await nearby(search_query, _float(request.query_params.get('radius_km')))
+            ))
+        async with sessions() as session:
+            rows = (await session.execute(
+                query.distinct().order_by(User.rating_avg.desc().nullslast(), User.fullname)
+            )).all()
+        return JSONResponse({'results': [row._asdict() for row in rows]})
+
+    @requires('customer')
+    async def customer_dashboard(request, user):
+        async with sessions() as session:
+            rows = (await session.execute(
+                _request_rows().where(ServiceRequest.customer_id == user.id).order_by(ServiceRequest.id.desc())
+            )).all()
+        return JSONResponse({'service_requests': [_serialize(row) for row in rows]})
+
+    @requires('professional')
+    async def professional_dashboard(request, user):
+        async with sessions() as session:
+            available = (await session.execute(_available_requests(user))).all()
+            accepted = (await session.execute(
+                _request_rows().where(
+                    ServiceRequest.professional_id == user.id,
+                    ServiceRequest.status.in_(['accepted', 'in_progress'])
+                )
+            )).all()
+        return JSONResponse({
+            'available_requests': [_serialize(row) for row in available],
+            'accepted_requests': [_serialize(row) for row in accepted],
+        })
+
+    @requires('professional')
+    async def professional_summary(request, user):
+        # Same figures as professional_routes.professional_summary
+        mine = ServiceRequest.professional_id == user.id
+        archived = ArchivedServiceRequest.professional_id == user.id
+        day = func.date(ServiceRequest.completed_at)
+        archived_day = func.date(ArchivedServiceRequest.completed_at)
+        async with sessions() as session:
+            total_services = await session.scalar(
+                select(func.count(ServiceRequest.id)).where(mine, ServiceRequest.status.in_(FINISHED_STATUSES))
+            )
+            earnings = dict((await session.execute(
+                select(day, func.sum(Service.base_price)).join(Service, ServiceRequest.service_id == Service.id)
+                .where(mine, ServiceRequest.status.in_(FINISHED_STATUSES)).group_by(day)
+            )).all())
+            service_data = dict((await session.execute(
+                select(Service.name, func.count(ServiceRequest.id))
+                .join(ServiceRequest, Service.id == ServiceRequest.service_id)
+                .where(Service.category_id == user.service_category_id).group_by(Service.id)
+            )).all())
+            total_services += await session.scalar(select(func.count(ArchivedServiceRequest.id)).where(archived))
+            archived_earnings = dict((await session.execute(
+                select(archived_day, func.sum(ArchivedServiceRequest.base_price)).where(archived)
+                .group_by(archived_day)
+            )).all())
+            archived_services = dict((await session.execute(
+                select(ArchivedServiceRequest.service_name, func.count(ArchivedServiceRequest.id))
+                .where(ArchivedServiceRequest.category_id == user.service_category_id)
+                .group_by(ArchivedServiceRequest.service_name)
+            )).all())
+
+        earnings = merge_counts(earnings, archived_earnings)
+        return JSONResponse({
+            'total_services': total_services,
+            'earnings': [{'day': day, 'total': earnings[day]} for day in sorted(earnings, key=lambda day: day or '')],
+            'ratings': {str(stars): count for stars, count in user.rating_histogram.items() if count},
+            'service_requests': merge_counts(service_data, archived_services),
+        })
+
+    @requires('professional')
+    async def professional_search(request, user):
+        # Same criteria as professional_routes.professional_search, over this professional's requests
+        criteria = request.query_params.get('search_criteria', '')
+        term = request.query_params.get('search_term', '')
+        if criteria not in ('date', 'address', 'pin_code') or not term:
+            return JSONResponse({'search_results': []})
+
+        query = _request_rows()
+        if criteria == 'date':
+            rejected = select(RejectedRequest.request_id).where(RejectedRequest.professional_id == user.id)
+            query = query.where(ServiceRequest.created_at.like(f'%{term}%'),
+                                (ServiceRequest.professional_id == user.id) | ServiceRequest.id.in_(rejected))
+        elif criteria == 'address':
+            query = query.where(Customer.address.like(f'%{term}%'), ServiceRequest.professional_id == user.id)
+        else:
+            pin_codes = await nearby(term, _float(request.query_params.get('radius_km')))
+            query = query.where(Customer.pin_code.in_(pin_codes), ServiceRequest.professional_id == user.id)
+        async with sessions() as session:
+            rows = (await session.execute(query.order_by(ServiceRequest.id))).all()
+        return JSONResponse({'search_results': [_serialize(row) for row in rows]})
+
+    @requires('professional')
+    async def professional_feed(request, user):
+        # Server-sent events announcing newly bookable requests in the professional's category
+        async def events():
+            last_id = request.headers.get('last-event-id') or request.query_params.get('after') or ''
+            last_id = int(last_id) if last_id.isdigit() else 0
+            while not await request.is_disconnected():
+                async with sessions() as session:
+                    rows = (await session.execute(
+                        _available_requests(user).where(ServiceRequest.id > last_id)
+                    )).all()
+                for row in rows:
+                    last_id = max(last_id, row.id)
+                    yield f'id: {row.id}\nevent: request\ndata: {json.dumps(_serialize(row))}\n\n'
+                if not rows:
+                    yield ': keep-alive\n\n'
+                await asyncio.sleep(poll_seconds)
+
+        return StreamingResponse(events(), media_type='text/event-stream',
+                                 headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        yield
+        await engine.dispose()
+        if archive_engine is not engine:
+            await archive_engine.dispose()
+
+    return Starlette(
+        routes=[
+            Route('/async/admin/summary', admin_summary),
+            Route('/async/customer/dashboard', customer_dashboard),
+            Route('/async/customer/search', customer_search),
+            Route('/async/customer/summary', customer_summary),
+            Route('/async/professional/dashboard', professional_dashboard),
+            Route('/async/professional/search', professional_search),
+            Route('/async/professional/summary', professional_summary),
+            Route('/async/professional/feed', professional_feed),
+            Mount('/', app=ThreadPoolWsgiToAsgi(flask_app)),
+        ],
+        lifespan=lifespan,
+    )
+
+
+class _ThreadPoolWsgiInstance(WsgiToAsgiInstance):
+    # asgiref runs the WSGI app thread-sensitively: every request on one shared thread, one at a
+    # time, and overlapping requests fail with "would deadlock". Flask needs no thread affinity.
+
+    @sync_to_async(thread_sensitive=False)
+    def run_wsgi_app(self, body):
+        # Runs the app and sends its response from one worker thread, as WsgiToAsgiInstance does
+        environ = self.build_environ(self.scope, body)
+        sent = 0
+        for output in self.wsgi_application(environ, self.start_response):
+            if not self.response_started:
+                self.response_started = True
+                self.sync_send(self.response_start)
+            # Never send more than a Content-Length the app declared
+            if self.response_content_length is not None:
+                output = output[:self.response_content_length - sent]
+            self.sync_send({'type': 'http.response.body', 'body': output, 'more_body': True})
+            sent += len(output)
+            if sent == self.response_content_length:
+                break
+        if not self.response_started:
+            self.response_started = True
+            self.sync_send(self.response_start)
+        self.sync_send({'type': 'http.response.body'})
+
+
+class ThreadPoolWsgiToAsgi(WsgiToAsgi):
+    """``WsgiToAsgi`` that runs requests on the event loop's thread pool, concurrently."""
+
+    async def __call__(self, scope, receive, send):
+        await _ThreadPoolWsgiInstance(self.wsgi_application)(scope, receive, send)
+
+
+def _async_url(url):
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _request_rows():
+    return select(
+        ServiceRequest.id, ServiceRequest.status, ServiceRequest.created_at,
+        Service.name.label('service_name'), Customer.fullname.label('customer_name')
+    ).join(Service, ServiceRequest.service_id == Service.id) \
+        .join(Customer, ServiceRequest.customer_id == Customer.id)
+
+
+def _available_requests(user):
+    # Same filter as professional_routes.professional_dashboard
+    rejected = select(RejectedRequest.request_id).where(RejectedRequest.professional_id == user.id)
+    return _request_rows().where(and_(
+        Service.category_id == user.service_category_id,
+        ServiceRequest.status == 'requested',
+        ServiceRequest.id.not_in(rejected),
+        ServiceRequest.professional_id.is_(None)
+    )).order_by(ServiceRequest.id)
+
+
+def _serialize(row):
+    return {
+        'id': row.id,
+        'service': row.service_name,
+        'customer': row.customer_name,
+        'status': row.status,
+        'created_at': row.created_at.isoformat() if row.created_at else None,
+    }
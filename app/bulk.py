@@ -0,0 +1,147 @@
+from datetime import datetime
+
+from sqlalchemy import func, insert, select, update
+
+from app import db
+from app.events import record_events
+from app.models import RejectedRequest, Service, ServiceRequest, User
+
+# Upper bound on ids per bulk action, keeping the IN (...) lists well inside SQLite's parameter limit
+MAX_BULK_IDS = 500
+
+
+def parse_ids(values):
+    """Distinct positive integer ids from a multi-value form field, in submission order."""
+    ids = {}  # Insertion-ordered, with constant-time membership checks
+    for value in values:
+        if len(ids) == MAX_BULK_IDS:
+            break
+        value = str(value)
+        if value.isdecimal() and len(value) <= 18:  # Longer ids would not fit SQLite's 64-bit integers
+            ids.setdefault(int(value), None)
+    return list(ids)
+
+
+def set_professional_status(user_ids, status):
+    """Approve or reject many professionals with one UPDATE.
+
+    Returns ``{user_id: outcome}``, where outcome is ``status`` for the rows
+    that changed, or the reason the id was skipped.
+    """
+    results = {user_id: 'not found' for user_id in user_ids}
+    for user_id, user_type, current_status in db.session.query(User.id, User.user_type, User.status) \
+            .filter(User.id.in_(user_ids)):
+        if user_type != 'professional':
+            results[user_id] = 'not a professional'
+        elif current_status == status:
+            results[user_id] = f'already {status}'
+
+    # The WHERE clause repeats the checks, so rows changed concurrently are left alone
+    changed = db.session.execute(
+        update(User)
+        .where(User.id.in_(user_ids), User.user_type == 'professional', User.status != status)
+        .values(status=status, rejected_at=datetime.utcnow() if status == 'rejected' else None)
+        .returning(User.id, User.service_category_id),
+        execution_options={'synchronize_session': False}
+    ).all()
+    db.session.commit()
+
+    for user_id, _ in changed:
+        results[user_id] = status
+    from app.recommendations import invalidate_category
+    for category_id in {category_id for _, category_id in changed}:
+        invalidate_category(category_id)
+    return results
+
+
+def accept_requests(professional, request_ids):
+    """Assign many open requests to ``professional`` with one UPDATE.
+
+    Returns ``{request_id: outcome}`` ('accepted' or why the id was skipped).
+    """
+    results = {request_id: 'not found' for request_id in request_ids}
+    rejected = select(RejectedRequest.request_id).where(RejectedRequest.professional_id == professional.id)
+    for request_id, category_id, was_rejected in db.session.query(
+        ServiceRequest.id, Service.category_id, ServiceRequest.id.in_(rejected)
+    ).join(Service).filter(ServiceRequest.id.in_(request_ids)):
+        if category_id != professional.service_category_id:
+            results[request_id] = 'outside your category'
+        elif was_rejected:
+            results[request_id] = 'rejected by you'
+        else:
+            results[request_id] = 'no longer available'
+
+    now = datetime.utcnow()
+    in_category = select(Service.id).where(Service.category_id == professional.service_category_id)
+    accepted = db.session.scalars(
+        update(ServiceRequest)
+        .where(
+            ServiceRequest.id.in_(request_ids),
+            ServiceRequest.status == 'requested',
+            ServiceRequest.professional_id.is_(None),
+            ServiceRequest.service_id.in_(in_category),
+            ServiceRequest.id.not_in(rejected)
+        )
+        .values(
+            status='accepted', professional_id=professional.id, completed_at=None, updated_at=now,
+            accepted_at=func.coalesce(ServiceRequest.accepted_at, now)
+        )
+        .returning(ServiceRequest.id),
+        execution_options={'synchronize_session': False}
+    ).all()
+    record_events(accepted, 'accepted', 'requested', 'accepted', professional.id)
+    db.session.commit()
+
+    for request_id in accepted:
+        results[request_id] = 'accepted'
+    if accepted:
+        from app.recommendations import note_transition
+        note_transition(professional, workload=len(accepted), accepted=len(accepted))
+    return results
+
+
+def reject_requests(professional, request_ids):
+    """Record rejections of many requests by ``professional`` with one INSERT.
+
+    Returns ``{request_id: outcome}`` ('rejected' or why the id was skipped).
+    """
+    results = {request_id: 'not found' for request_id in request_ids}
+    already = set(db.session.scalars(
+        select(RejectedRequest.request_id).where(
+            RejectedRequest.request_id.in_(request_ids),
+            RejectedRequest.professional_id == professional.id
+        )
+    ))
+
+    rejected = {}
+    for request_id, status in db.session.query(ServiceRequest.id, ServiceRequest.status) \
+            .filter(ServiceRequest.id.in_(request_ids)):
+        if status == 'accepted':
+            results[request_id] = 'already accepted'
+        elif request_id in already:
+            results[request_id] = 'already rejected'
+        else:
+            rejected[request_id] = status
+
+    if rejected:
+        db.session.execute(insert(RejectedRequest), [
+            {'request_id': request_id, 'professional_id': professional.id} for request_id in rejected
+        ])
+        for status in set(rejected.values()):
+            ids = [request_id for request_id, current in rejected.items() if current == status]
+            record_events(ids, 'rejected', status, status, professional.id)
+    db.session.commit()
+
+    for request_id in rejected:
+        results[request_id] = 'rejected'
+    if rejected:
+        from app.recommendations import note_transition
+        note_transition(professional, rejections=len(rejected))
+    return results
+
+
+def summarize(results, done):
+    # Flash text such as "3 approved; skipped #7 (already approved), #9 (not found)"
+    succeeded = sum(1 for outcome in results.values() if outcome == done)
+    skipped = [f'#{item_id} ({outcome})' for item_id, outcome in results.items() if outcome != done]
+    return f'{succeeded} {done}' + (f"; skipped {', '.join(skipped)}" if skipped else '')
@@ -0,0 +1,161 @@
+import click
+
+
+def add_missing_columns(db):
+    """Add model columns that existing tables lack; create_all only ever creates whole tables.
+
+    Returns the added columns as ``(table, column)`` pairs.
+    """
+    from sqlalchemy import inspect, text
+    from sqlalchemy.schema import CreateColumn
+
+    added = []
+    for key, metadata in db.metadatas.items():
+        engine = db.engines[key]
+        inspector = inspect(engine)
+        with engine.begin() as connection:
+            for table in metadata.sorted_tables:
+                if not inspector.has_table(table.name):
+                    continue
+                existing = {column['name'] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in existing:
+                        continue
+                    connection.execute(text(
+                        f'ALTER TABLE {engine.dialect.identifier_preparer.format_table(table)} '
+                        f'ADD COLUMN {CreateColumn(column).compile(dialect=engine.dialect)}'
+                    ))
+                    added.append((table.name, column.name))
+    return added
+
+
+def register_commands(app):
+    @app.cli.command('init-db')
+    @click.option('--admin-email', default='admin@example.com', show_default=True)
+    @click.option('--admin-password', default='admin123', show_default=True)
+    def init_db(admin_email, admin_password):
+        """Create or upgrade the database tables and create the admin account.
+
+        Run once per deployment, and again after upgrading the app.
+        """
+        from datetime import datetime
+        from app import bcrypt, db
+        from app.models import User
+
+        db.create_all()
+        added = add_missing_columns(db)
+        for table, column in added:
+            click.echo(f'Added column {table}.{column}.')
+        if ('user', 'rating_sum') in added:
+            # Ratings given before the aggregate columns existed still have to be counted
+            from app.ratings import rebuild_rating_aggregates
+            click.echo(f'Backfilled rating aggregates for {rebuild_rating_aggregates()} professionals.')
+        if ('user', 'rejected_at') in added:
+            # The rejection time of existing rejections is unknown; their upload retention starts now
+            rejected = User.query.filter_by(user_type='professional', status='rejected') \
+                .update({'rejected_at': datetime.utcnow()}, synchronize_session=False)
+            db.session.commit()
+            click.echo(f'Set rejected_at for {rejected} rejected professionals.')
+        # create_all also skips indexes added to tables that already exist (e.g. uq_service_request_open)
+        from sqlalchemy.exc import IntegrityError
+        for key, metadata in db.metadatas.items():
+            for table in metadata.sorted_tables:
+                for index in table.indexes:
+                    try:
+                        index.create(db.engines[key], checkfirst=True)
+                    except IntegrityError:
+                        # Data from before the index existed can violate it; the app works without it
+                        click.echo(f'Skipped unique index {index.name}: existing rows of {table.name} '
+                                   f'violate it. Resolve the duplicates and run init-db again.', err=True)
+        if User.query.filter_by(email=admin_email).first():
+            click.echo('Tables ready; admin account already exists.')
+            return
+
+        hashed_password = bcrypt.generate_password_hash(admin_password).decode('utf-8')
+        db.session.add(User(
+            email=admin_email,
+            password=hashed_password,
+            user_type='admin',
+            fullname='Admin User'
+        ))
+        db.session.commit()
+        click.echo(f'Tables ready; created admin account {admin_email}.')
+
+    @app.cli.command('sync-replicas')
+    def sync_replicas():
+        """Refresh file-based SQLite read replicas from the primary database.
+
+        The sync_replicas job does the same on a schedule.
+        """
+        from app import db
+        from app.routing import sync_replicas as copy_to_replicas
+
+        try:
+            for line in copy_to_replicas(db):
+                click.echo(line)
+        except ValueError as exc:
+            raise click.ClickException(str(exc))
+
+    @app.cli.command('archive-requests')
+    @click.option('--days', type=click.IntRange(min=0), default=None,
+                  help='Archive requests closed longer ago than this.')
+    @click.option('--batch-size', type=click.IntRange(min=1), default=None, help='Requests moved per transaction.')
+    def archive_requests(days, batch_size):
+        """Move old closed requests and their rejections into the archive tables."""
+        from app import db
+        from app.archive import archive_closed_requests
+
+        db.create_all(bind_key='archive')
+        if days is None:
+            days = app.config['ARCHIVE_AFTER_DAYS']
+        moved = archive_closed_requests(older_than_days=days, batch_size=batch_size)
+        click.echo(f'Archived {moved} requests closed more than {days} days ago.')
+
+    @app.cli.command('build-assets')
+    def build_assets():
+        """Write content-hashed, precompressed copies of app/static for long-lived caching."""
+        from app.compression import build_static_assets
+        manifest = build_static_assets(app.static_folder)
+        click.echo(f'Fingerprinted {len(manifest)} static files; restart the app to serve them.')
+
+    @app.cli.command('run-jobs')
+    @click.option('--once', is_flag=True, help='Run what is due (or the --job jobs) one time, then exit.')
+    @click.option('--job', 'names', multiple=True, help='Only run this job; repeatable.')
+    @click.option('--threads', type=int, default=None, help='Jobs run at the same time by this worker.')
+    def run_jobs(once, names, threads):
+        """Run the scheduled maintenance jobs; several workers can share one database."""
+        from app import db
+        from app.jobs import JOBS, run_scheduler
+
+        unknown = set(names) - set(JOBS)
+        if unknown:
+            raise click.BadParameter(f'Unknown job(s): {", ".join(sorted(unknown))}. '
+                                     f'Known: {", ".join(sorted(JOBS))}.', param_hint='--job')
+        db.create_all()
+        results = run_scheduler(app, once=once, names=list(names), threads=threads)
+        for name, status in results:
+            click.echo(f'{name}: {status}')
+        if once and not results:
+            click.echo('No jobs were due.')
+
+    @app.cli.command('job-status')
+    def job_status():
+        """Show each job's schedule, last outcome and recent run times."""
+        from app.jobs import job_status as load_job_status
+
+        click.echo(f'{"job":<24} {"enabled":<8} {"running":>7} {"next run (UTC)":<20} {"last":<10} '
+                   f'{"last ms":>9} {"avg ms":>9}')
+        for scheduled, average_ms in load_job_status():
+            click.echo(
+                f'{scheduled.name:<24} {"yes" if scheduled.enabled else "no":<8} {scheduled.running:>7} '
+                f'{scheduled.next_run_at:%Y-%m-%d %H:%M:%S}  {scheduled.last_status or "-":<10} '
+                f'{scheduled.last_duration_ms if scheduled.last_duration_ms is not None else "-":>9} '
+                f'{format(average_ms, ".0f") if average_ms is not None else "-":>9}'
+            )
+
+    @app.cli.command('rebuild-ratings')
+    def rebuild_ratings():
+        """Recompute every professional's rating aggregates from service requests."""
+        from app.ratings import rebuild_rating_aggregates
+        updated = rebuild_rating_aggregates()
+        click.echo(f'Rebuilt rating aggregates for {updated} professionals.')
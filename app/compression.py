@@ -0,0 +1,131 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+from flask import current_app, request, send_from_directory
+
+try:
+    import brotli  # Optional: `pip install Brotli` enables br alongside gzip
+except ImportError:
+    brotli = None
+
+DIST_DIR = 'dist'  # Fingerprinted copies live in app/static/dist, written by `flask build-assets`
+MANIFEST = 'manifest.json'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+COMPRESSED_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def _encodings():
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def _accepted_encoding():
+    for encoding in _encodings():
+        if request.accept_encodings.quality(encoding) > 0:
+            return encoding
+    return None
+
+
+def _compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(level, 11))
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def compress_response(response):
+    """``after_request`` hook: gzip/brotli HTML and JSON bodies of at least ``COMPRESS_MIN_SIZE`` bytes."""
+    config = current_app.config
+    if (response.direct_passthrough or response.is_streamed or response.status_code in (204, 206, 304)
+            or response.status_code < 200 or 'Content-Encoding' in response.headers
+            or response.mimetype not in config['COMPRESS_MIMETYPES']):
+        return response
+
+    body = response.get_data()
+    if len(body) < config['COMPRESS_MIN_SIZE']:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = _accepted_encoding()
+    if encoding is None:
+        return response
+
+    response.set_data(_compress(body, encoding, config['COMPRESS_LEVEL']))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def build_static_assets(static_folder, level=9):
+    """Copy each static file to ``dist/<name>.<hash><ext>``, precompress it, and write the manifest.
+
+    Returns the manifest (``{original: fingerprinted}``, relative to the static folder).
+    """
+    dist = os.path.join(static_folder, DIST_DIR)
+    os.makedirs(dist, exist_ok=True)
+    manifest = {}
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = [name for name in dirs if os.path.join(root, name) != dist]
+        for name in sorted(files):
+            source = os.path.join(root, name)
+            relative = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            with open(source, 'rb') as handle:
+                data = handle.read()
+
+            stem, extension = os.path.splitext(relative)
+            hashed = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{extension}'
+            target = os.path.join(dist, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as handle:
+                handle.write(data)
+
+            # Already-compressed formats (PNG, JPEG, ...) barely shrink; only keep variants that pay off
+            for encoding in _encodings():
+                compressed = _compress(data, encoding, level)
+                if len(compressed) < len(data) * 0.9:
+                    with open(target + COMPRESSED_SUFFIXES[encoding], 'wb') as handle:
+                        handle.write(compressed)
+            manifest[relative] = f'{DIST_DIR}/{hashed}'
+
+    with open(os.path.join(dist, MANIFEST), 'w') as handle:
+        json.dump(manifest, handle, indent=2, sort_keys=True)
+    return manifest
+
+
+def init_compression(app):
+    app.after_request(compress_response)
+
+    # Fingerprinted static assets, when `flask build-assets` has been run
+    manifest_path = os.path.join(app.static_folder, DIST_DIR, MANIFEST)
+    if not os.path.exists(manifest_path):
+        return
+    with open(manifest_path) as handle:
+        manifest = json.load(handle)
+    fingerprinted = set(manifest.values())
+
+    @app.url_defaults
+    def fingerprint_static_urls(endpoint, values):
+        # Templates keep calling url_for('static', filename='image.png')
+        if endpoint == 'static' and values.get('filename') in manifest:
+            values['filename'] = manifest[values['filename']]
+
+    @app.before_request
+    def serve_precompressed():
+        if request.endpoint != 'static' or request.view_args.get('filename') not in fingerprinted:
+            return None
+        filename = request.view_args['filename']
+        encoding = _accepted_encoding()
+        if encoding is None or not os.path.exists(os.path.join(app.static_folder, filename + COMPRESSED_SUFFIXES[encoding])):
+            return None
+        response = send_from_directory(app.static_folder, filename + COMPRESSED_SUFFIXES[encoding],
+                                       mimetype=mimetypes.guess_type(filename)[0], max_age=31536000)
+        response.headers['Content-Encoding'] = encoding
+        response.headers['Cache-Control'] = IMMUTABLE
+        response.vary.add('Accept-Encoding')
+        return response
+
+    @app.after_request
+    def cache_fingerprinted(response):
+        # The name changes with the content, so clients may cache these forever
+        if request.endpoint == 'static' and request.view_args.get('filename') in fingerprinted:
+            response.headers['Cache-Control'] = IMMUTABLE
+        return response
@@ -0,0 +1,66 @@
+from datetime import datetime
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import ServiceRequestEvent
+
+# Events are queued on the session and written with one executemany on commit,
+# so a route that touches several requests costs a single extra round-trip.
+PENDING_KEY = 'pending_request_events'
+
+
+def record_event(service_request, event_name, from_status, to_status, actor_id=None):
+    db.session.info.setdefault(PENDING_KEY, []).append(
+        (service_request, event_name, from_status, to_status, actor_id, datetime.utcnow())
+    )
+
+
+def record_events(request_ids, event_name, from_status, to_status, actor_id=None):
+    # Same as record_event for requests changed by a bulk UPDATE, where only the ids are at hand
+    now = datetime.utcnow()
+    db.session.info.setdefault(PENDING_KEY, []).extend(
+        (request_id, event_name, from_status, to_status, actor_id, now) for request_id in request_ids
+    )
+
+
+def transition(service_request, status, actor_id=None, event_name=None):
+    """Move ``service_request`` to ``status``, stamping lifecycle columns and logging the change."""
+    previous = service_request.status
+    record_event(service_request, event_name or status, previous, status, actor_id)
+    service_request.status = status
+
+    now = datetime.utcnow()
+    if status == 'accepted':
+        service_request.accepted_at = service_request.accepted_at or now
+        service_request.completed_at = None  # Re-opened requests are no longer complete
+    elif status in ('completed', 'closed'):
+        service_request.completed_at = service_request.completed_at or now
+
+
+@event.listens_for(Session, 'before_commit')
+def _flush_pending_events(session):
+    pending = session.info.pop(PENDING_KEY, None)
+    if not pending:
+        return
+
+    # New requests need their primary keys before the log rows can point at them
+    session.flush()
+    rows = [
+        {
+            'request_id': service_request if isinstance(service_request, int) else service_request.id,
+            'event': event_name,
+            'from_status': from_status,
+            'to_status': to_status,
+            'actor_id': actor_id,
+            'created_at': created_at,
+        }
+        for service_request, event_name, from_status, to_status, actor_id, created_at in pending
+    ]
+    session.execute(insert(ServiceRequestEvent), rows)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_pending_events(session, previous_transaction):
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,141 @@
+import csv
+import math
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+import numpy as np
+from flask import current_app
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+
+class PinCodeIndex:
+    """Pin code -> coordinates table with a uniform lat/long grid for radius queries.
+
+    The reference file is a CSV with ``pin_code,latitude,longitude,region``
+    columns. The bundled ``app/data/pincodes.csv`` only covers a few cities;
+    point ``PINCODE_DATA_PATH`` at a full India Post directory export for
+    production use.
+    """
+
+    def __init__(self, rows, cell_km=10.0):
+        self.pins = [row[0] for row in rows]
+        self.latitudes = np.radians(np.array([row[1] for row in rows], dtype=np.float64))
+        self.longitudes = np.radians(np.array([row[2] for row in rows], dtype=np.float64))
+        self.regions = [row[3] for row in rows]
+        self.positions = {pin: index for index, pin in enumerate(self.pins)}
+
+        # Bucket every pin code into a grid cell roughly cell_km wide
+        self.cell_degrees = cell_km / KM_PER_DEGREE
+        self.cells = defaultdict(list)
+        for index, row in enumerate(rows):
+            self.cells[self._cell(row[1], row[2])].append(index)
+        self.cells = {cell: np.array(indexes) for cell, indexes in self.cells.items()}
+
+    @classmethod
+    def from_csv(cls, path, cell_km=10.0):
+        rows = []
+        with open(path, newline='', encoding='utf-8') as handle:
+            for record in csv.DictReader(handle):
+                rows.append((
+                    record['pin_code'].strip(),
+                    float(record['latitude']),
+                    float(record['longitude']),
+                    record.get('region', '').strip(),
+                ))
+        return cls(rows, cell_km=cell_km)
+
+    def _cell(self, latitude, longitude):
+        return (math.floor(latitude / self.cell_degrees), math.floor(longitude / self.cell_degrees))
+
+    def __contains__(self, pin_code):
+        return pin_code in self.positions
+
+    def coordinates(self, pin_code):
+        index = self.positions.get(pin_code)
+        if index is None:
+            return None
+        return math.degrees(self.latitudes[index]), math.degrees(self.longitudes[index])
+
+    def within(self, pin_code, radius_km):
+        """Return ``[(pin_code, distance_km), ...]`` within ``radius_km``, nearest first."""
+        origin = self.coordinates(pin_code)
+        if origin is None:
+            return []
+        latitude, longitude = origin
+
+        # Only the grid cells overlapping the search box need distance checks
+        lat_span = radius_km / KM_PER_DEGREE
+        lon_span = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+        low = self._cell(latitude - lat_span, longitude - lon_span)
+        high = self._cell(latitude + lat_span, longitude + lon_span)
+        buckets = [
+            self.cells[(row, column)]
+            for row in range(low[0], high[0] + 1)
+            for column in range(low[1], high[1] + 1)
+            if (row, column) in self.cells
+        ]
+        if not buckets:
+            return []
+
+        candidates = np.concatenate(buckets)
+        distances = haversine_km(
+            math.radians(latitude), math.radians(longitude),
+            self.latitudes[candidates], self.longitudes[candidates]
+        )
+        inside = distances <= radius_km
+        order = np.argsort(distances[inside], kind='stable')
+        candidates, distances = candidates[inside][order], distances[inside][order]
+        return [(self.pins[index], round(float(distance), 2)) for index, distance in zip(candidates, distances)]
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    # All angles in radians; latitudes/longitudes may be arrays
+    a = np.sin((latitudes - latitude) / 2) ** 2 + \
+        np.cos(latitude) * np.cos(latitudes) * np.sin((longitudes - longitude) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_pin_index():
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                _index = PinCodeIndex.from_csv(
+                    current_app.config['PINCODE_DATA_PATH'],
+                    cell_km=current_app.config['GEO_GRID_KM']
+                )
+    return _index
+
+
+@lru_cache(maxsize=4096)
+def _nearby(pin_code, radius_km):
+    return tuple(pin for pin, _ in _index.within(pin_code, radius_km))
+
+
+def search_radius(radius_km=None):
+    # Default and clamp user-supplied radii so one query cannot cover the whole country.
+    # float() accepts 'nan' and 'inf', which would otherwise reach the grid arithmetic
+    config = current_app.config
+    if radius_km is None or not math.isfinite(radius_km):
+        radius_km = config['GEO_DEFAULT_RADIUS_KM']
+    return float(min(max(radius_km, 0), config['GEO_MAX_RADIUS_KM']))
+
+
+def nearby_pin_codes(pin_code, radius_km=None):
+    """Pin codes within ``radius_km`` of ``pin_code`` (itself included).
+
+    Unknown pin codes only match themselves, so searches degrade to an
+    exact match instead of returning nothing.
+    """
+    pin_code = (pin_code or '').strip()
+    radius_km = search_radius(radius_km)
+    if pin_code not in get_pin_index():
+        return [pin_code] if pin_code else []
+    return list(_nearby(pin_code, radius_km))
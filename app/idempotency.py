@@ -0,0 +1,115 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request, session
+from markupsafe import Markup
+
+HEADER = 'Idempotency-Key'
+FIELD = 'idempotency_key'
+WAIT_SECONDS = 10  # How long a duplicate waits for the original to finish before giving up
+
+
+class _Entry:
+    __slots__ = ('expires_at', 'done', 'response')
+
+    def __init__(self, expires_at):
+        self.expires_at = expires_at
+        self.done = threading.Event()
+        self.response = None  # (status, headers, body) once the original request has finished
+
+
+class ResponseCache:
+    """In-process LRU of responses to keyed POSTs, each kept for ``ttl`` seconds."""
+
+    def __init__(self, max_entries, ttl):
+        self.entries = OrderedDict()
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+
+    def begin(self, key, now):
+        # Returns (entry, True) for the first request with this key, (entry, False) for duplicates
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                self.entries.move_to_end(key)
+                return entry, False
+            entry = self.entries[key] = _Entry(now + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            return entry, True
+
+    def finish(self, entry, response):
+        entry.response = response
+        entry.done.set()
+
+    def abandon(self, key, entry):
+        # The original failed: forget the key so a retry runs the view again
+        with self.lock:
+            if self.entries.get(key) is entry:
+                del self.entries[key]
+        entry.done.set()
+
+
+def idempotent(view):
+    """Replay the first response to a POST carrying an idempotency key instead of running it twice.
+
+    The key comes from the ``Idempotency-Key`` header or the hidden form
+    field rendered by ``idempotency_field()``. Place this above
+    ``login_required`` so a replay needs no database access at all.
+    """
+    @wraps(view)
+    def decorated(*args, **kwargs):
+        key = request.headers.get(HEADER) or request.form.get(FIELD)
+        cache = current_app.extensions.get('idempotency')
+        if request.method != 'POST' or not key or cache is None:
+            return view(*args, **kwargs)
+
+        # Scoped to the session's user (or client IP), so keys cannot collide across users
+        scope = (session.get('_user_id') or request.remote_addr, request.endpoint, key[:128])
+        entry, first = cache.begin(scope, time.time())
+        if not first:
+            if not entry.done.wait(WAIT_SECONDS):
+                return current_app.response_class('This request is still being processed.\n', status=409,
+                                                  mimetype='text/plain')
+            if entry.response is not None:
+                status, headers, body = entry.response
+                response = current_app.response_class(body, status=status, headers=headers)
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+            # The original failed and was forgotten; this request runs normally
+            return view(*args, **kwargs)
+
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except BaseException:
+            cache.abandon(scope, entry)
+            raise
+        if response.status_code >= 500:
+            cache.abandon(scope, entry)
+        elif (response.is_streamed
+              or response.calculate_content_length() > current_app.config['IDEMPOTENCY_MAX_BODY_BYTES']):
+            # Too big to hold on to (e.g. a rendered page): duplicates are sent to fetch the page instead
+            cache.finish(entry, (303, [('Location', request.path)], b''))
+        else:
+            # Never replay cookies: the session may have moved on since
+            headers = [(name, value) for name, value in response.headers if name.lower() != 'set-cookie']
+            cache.finish(entry, (response.status_code, headers, response.get_data()))
+        return response
+    return decorated
+
+
+def idempotency_field():
+    # Fresh key per rendered form, so a double-click or resubmit of the same form is deduplicated
+    return Markup(f'<input type="hidden" name="{FIELD}" value="{uuid.uuid4().hex}">')
+
+
+def init_idempotency(app):
+    app.extensions['idempotency'] = ResponseCache(
+        app.config['IDEMPOTENCY_MAX_KEYS'], app.config['IDEMPOTENCY_TTL_SECONDS']
+    )
+    app.jinja_env.globals['idempotency_field'] = idempotency_field
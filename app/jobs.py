@@ -0,0 +1,310 @@
+import logging
+import os
+import socket
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, update
+
+from app import db
+from app.models import JobRun, ScheduledJob, ServiceRequest, User
+
+logger = logging.getLogger(__name__)
+
+# Registered maintenance jobs: name -> how often to run, how many runs may overlap, and how long a
+# run may hold its lease before another worker treats it as crashed. JOB_SCHEDULE overrides these.
+JobSpec = namedtuple('JobSpec', ['function', 'interval_seconds', 'max_concurrency', 'timeout_seconds'])
+JOBS = {}
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+def job(name, interval_seconds, max_concurrency=1, timeout_seconds=HOUR):
+    def decorator(function):
+        JOBS[name] = JobSpec(function, interval_seconds, max_concurrency, timeout_seconds)
+        return function
+    return decorator
+
+
+def job_spec(name):
+    spec = JOBS[name]
+    overrides = current_app.config['JOB_SCHEDULE'].get(name, {})
+    return spec._replace(**{key: value for key, value in overrides.items() if key in spec._fields})
+
+
+def sync_jobs():
+    """Create or update a ``ScheduledJob`` row for every registered job; new jobs are due at once."""
+    now = datetime.utcnow()
+    existing = {scheduled.name: scheduled for scheduled in ScheduledJob.query.all()}
+    for name in JOBS:
+        spec = job_spec(name)
+        enabled = current_app.config['JOB_SCHEDULE'].get(name, {}).get('enabled', True)
+        scheduled = existing.pop(name, None)
+        if scheduled is None:
+            db.session.add(ScheduledJob(name=name, interval_seconds=spec.interval_seconds,
+                                        max_concurrency=spec.max_concurrency, enabled=enabled, next_run_at=now))
+        else:
+            scheduled.interval_seconds = spec.interval_seconds
+            scheduled.max_concurrency = spec.max_concurrency
+            scheduled.enabled = enabled
+    for scheduled in existing.values():
+        scheduled.enabled = False  # Removed from the code
+    db.session.commit()
+
+
+def claim(name, worker, force=False):
+    """Take a slot of job ``name`` for ``worker``; returns the new ``JobRun`` id, or None.
+
+    The single conditional UPDATE is the lock: of several workers polling the same database,
+    only those that find the job due and under its concurrency limit get a row back.
+    """
+    spec = job_spec(name)
+    now = datetime.utcnow()
+    criteria = [
+        ScheduledJob.name == name,
+        ScheduledJob.enabled.is_(True),
+        ScheduledJob.running < ScheduledJob.max_concurrency,
+    ]
+    if not force:
+        criteria.append(ScheduledJob.next_run_at <= now)
+    claimed = db.session.execute(
+        update(ScheduledJob).where(*criteria).values(
+            running=ScheduledJob.running + 1,
+            next_run_at=now + timedelta(seconds=spec.interval_seconds),
+        ).execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
+        db.session.rollback()
+        return None
+
+    run = JobRun(job_name=name, worker=worker, status='running', started_at=now,
+                 lease_until=now + timedelta(seconds=spec.timeout_seconds))
+    db.session.add(run)
+    db.session.commit()
+    return run.id
+
+
+def finish(run_id, status, result=None):
+    run = db.session.get(JobRun, run_id)
+    now = datetime.utcnow()
+    duration_ms = int((now - run.started_at).total_seconds() * 1000)
+    # Guarded on 'running': if the lease expired meanwhile, reclaim_expired already freed the slot
+    finished = db.session.execute(
+        update(JobRun).where(JobRun.id == run_id, JobRun.status == 'running').values(
+            status=status, finished_at=now, duration_ms=duration_ms, result=result
+        ).execution_options(synchronize_session=False)
+    ).rowcount
+    if finished:
+        db.session.execute(
+            update(ScheduledJob).where(ScheduledJob.name == run.job_name).values(
+                running=ScheduledJob.running - 1, last_status=status,
+                last_duration_ms=duration_ms, last_finished_at=now,
+            ).execution_options(synchronize_session=False)
+        )
+    else:
+        logger.warning('Job run %s (%s) finished after its lease expired', run_id, run.job_name)
+    db.session.commit()
+
+
+def reclaim_expired():
+    """Mark runs whose lease ran out (crashed or killed workers) as expired and free their slots."""
+    now = datetime.utcnow()
+    expired = db.session.execute(
+        select(JobRun.id, JobRun.job_name).where(JobRun.status == 'running', JobRun.lease_until < now)
+    ).all()
+    for run_id, name in expired:
+        if db.session.execute(
+            update(JobRun).where(JobRun.id == run_id, JobRun.status == 'running').values(
+                status='expired', finished_at=now, result='Lease expired before the run finished.'
+            ).execution_options(synchronize_session=False)
+        ).rowcount:
+            db.session.execute(
+                update(ScheduledJob).where(ScheduledJob.name == name, ScheduledJob.running > 0).values(
+                    running=ScheduledJob.running - 1, last_status='expired'
+                ).execution_options(synchronize_session=False)
+            )
+    db.session.commit()
+    return len(expired)
+
+
+def execute(app, run_id, name):
+    with app.app_context():
+        try:
+            result = JOBS[name].function()
+        except Exception as exc:
+            db.session.rollback()
+            logger.exception('Job %s failed', name)
+            finish(run_id, 'failed', f'{type(exc).__name__}: {exc}')
+            return name, 'failed'
+        finish(run_id, 'succeeded', result)
+        return name, 'succeeded'
+
+
+def run_scheduler(app, once=False, names=None, threads=None, poll_seconds=None):
+    """Poll for due jobs and run them on a thread pool until interrupted.
+
+    ``names`` limits it to those jobs. With ``once``, runs whatever is due (or every job in
+    ``names``, due or not) a single time and returns ``[(name, status), ...]``.
+    """
+    threads = threads or app.config['JOB_THREADS']
+    poll_seconds = poll_seconds or app.config['JOB_POLL_SECONDS']
+    worker = f'{socket.gethostname()}:{os.getpid()}'
+    with app.app_context():
+        sync_jobs()
+
+    active = set()
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='job') as executor:
+        while True:
+            with app.app_context():
+                reclaim_expired()
+                for name in names or JOBS:
+                    # Only claim what the pool can start now, so leases are not spent waiting in its queue
+                    if not once and len(active) >= threads:
+                        break
+                    run_id = claim(name, worker, force=once and bool(names))
+                    if run_id is not None:
+                        logger.info('Starting job %s (run %s)', name, run_id)
+                        active.add(executor.submit(execute, app, run_id, name))
+
+            if once:
+                return [future.result() for future in active]
+            time.sleep(poll_seconds)
+            active = {future for future in active if not future.done()}
+
+
+def job_status():
+    """Each job's schedule and last outcome, with the average duration of its recent successful runs."""
+    statuses = []
+    for scheduled in ScheduledJob.query.order_by(ScheduledJob.name):
+        durations = [
+            duration for (duration,) in db.session.query(JobRun.duration_ms).filter(
+                JobRun.job_name == scheduled.name, JobRun.status == 'succeeded'
+            ).order_by(JobRun.id.desc()).limit(20)
+        ]
+        statuses.append((scheduled, sum(durations) / len(durations) if durations else None))
+    return statuses
+
+
+@job('recompute_summaries', interval_seconds=5 * 60)
+def recompute_summaries():
+    # Precomputes the admin trend charts into snapshots that every web worker reads (app/snapshots.py)
+    from app.analytics import get_trends, invalidate_cache
+    from app.snapshots import save_snapshot
+
+    invalidate_cache()
+    days_list = current_app.config['ANALYTICS_SNAPSHOT_DAYS']
+    for days in days_list:
+        save_snapshot(f'admin_trends:{days}', get_trends(('admin',), days=days))
+    return f'Refreshed admin trends for {", ".join(map(str, days_list))} days.'
+
+
+@job('rebuild_ratings', interval_seconds=6 * HOUR)
+def rebuild_ratings():
+    # The rating aggregates are what professional search sorts and filters by
+    from app.ratings import rebuild_rating_aggregates
+    return f'Rebuilt rating aggregates for {rebuild_rating_aggregates()} professionals.'
+
+
+@job('expire_stale_requests', interval_seconds=HOUR)
+def expire_stale_requests():
+    from app.events import record_events
+
+    now = datetime.utcnow()
+    cutoff = now - timedelta(days=current_app.config['STALE_REQUEST_DAYS'])
+    expired = db.session.execute(
+        update(ServiceRequest).where(ServiceRequest.status == 'requested', ServiceRequest.created_at < cutoff)
+        .values(status='expired', updated_at=now)
+        .returning(ServiceRequest.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    record_events(expired, 'expired', 'requested', 'expired')
+    db.session.commit()
+    return f'Expired {len(expired)} requests left unaccepted since before {cutoff:%Y-%m-%d}.'
+
+
+@job('clean_rejected_uploads', interval_seconds=DAY)
+def clean_rejected_uploads():
+    """Delete verification documents of professionals rejected longer ago than the retention period."""
+    cutoff = datetime.utcnow() - timedelta(days=current_app.config['REJECTED_UPLOAD_RETENTION_DAYS'])
+    folder = current_app.config['UPLOAD_FOLDER']
+
+    removed = 0
+    rejected = User.query.filter(
+        User.user_type == 'professional', User.status == 'rejected',
+        User.document_path.isnot(None), User.rejected_at < cutoff
+    ).all()
+    # Uploads are saved under their secure_filename, so accounts can end up sharing one file
+    kept = {_file_name(path) for (path,) in db.session.query(User.document_path).filter(
+        User.document_path.isnot(None), User.id.notin_([professional.id for professional in rejected])
+    )}
+    for professional in rejected:
+        name = _file_name(professional.document_path)
+        path = os.path.join(folder, name)
+        if name not in kept and os.path.isfile(path):
+            os.remove(path)
+            removed += 1
+        professional.document_path = None
+    db.session.commit()
+    return f'Removed {removed} uploaded documents.'
+
+
+def _file_name(path):
+    # Stored paths may come from another host (or a Windows one, where os.path.basename would not
+    # split them); the upload itself always lives in UPLOAD_FOLDER under this name
+    return path.replace('\\', '/').rsplit('/', 1)[-1]
+
+
+@job('archive_requests', interval_seconds=DAY, timeout_seconds=4 * HOUR)
+def archive_requests():
+    from app.archive import archive_closed_requests
+    return f'Archived {archive_closed_requests()} closed requests.'
+
+
+@job('prune_rate_limits', interval_seconds=HOUR)
+def prune_rate_limits():
+    limiter = current_app.extensions.get('ratelimit')
+    if limiter is None or not hasattr(limiter.store, 'prune'):
+        return 'Skipped: rate limits are not kept in a shared SQLite store.'
+    return f'Pruned {limiter.store.prune()} idle rate-limit buckets.'
+
+
+@job('sync_replicas', interval_seconds=60)
+def sync_replicas():
+    # Bounds how stale replica_reads pages get for users outside their read-your-writes window
+    from app.routing import sync_replicas as copy_to_replicas
+    return ' '.join(copy_to_replicas(db)) or 'Skipped: no read replicas configured.'
+
+
+def _sqlite_engines():
+    # Each database file once; replicas are overwritten by the sync_replicas job anyway
+    replicas = set(current_app.config['SQLALCHEMY_REPLICA_BINDS'])
+    engines = {}
+    for key, engine in db.engines.items():
+        if key not in replicas and engine.url.get_backend_name() == 'sqlite':
+            engines.setdefault(engine.url.database, engine)
+    return engines
+
+
+def _run_maintenance(statement):
+    engines = _sqlite_engines()
+    for engine in engines.values():
+        # ANALYZE and VACUUM cannot run inside the transaction the driver would otherwise open
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            connection.exec_driver_sql(statement)
+    return f'Ran {statement} on {", ".join(engines) or "no SQLite databases"}.'
+
+
+@job('analyze_database', interval_seconds=DAY)
+def analyze_database():
+    # Refreshes the statistics the SQLite query planner picks indexes with
+    return _run_maintenance('ANALYZE')
+
+
+@job('vacuum_database', interval_seconds=7 * DAY, timeout_seconds=4 * HOUR)
+def vacuum_database():
+    # Reclaims the space freed by archival and expiry; takes an exclusive lock while it runs
+    return _run_maintenance('VACUUM')
@@ -2,6 +2,8 @@ from app import db, login_manager
 from flask_login import UserMixin
 from datetime import datetime
 
+OPEN_REQUEST_STATUSES = ['requested', 'accepted', 'in_progress']
+
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
@@ -13,7 +15,7 @@ class User(db.Model, UserMixin):
     user_type = db.Column(db.String(20), nullable=False)  # 'customer', 'professional', 'admin'
     fullname = db.Column(db.String(100))
     address = db.Column(db.Text)
-    pin_code = db.Column(db.String(10))
+    pin_code = db.Column(db.String(10), index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Additional fields for professionals
@@ -22,6 +24,22 @@ class User(db.Model, UserMixin):
     experience = db.Column(db.Integer)
     document_path = db.Column(db.String(255))
     status = db.Column(db.String(20), default='pending')  # 'pending', 'approved', 'rejected'
+    rejected_at = db.Column(db.DateTime)  # When an admin last rejected the professional; cleared on approval
+
+    # Denormalized rating aggregates for professionals, kept up to date by app/ratings.py
+    rating_sum = db.Column(db.Integer, default=0, server_default='0')
+    rating_count = db.Column(db.Integer, default=0, server_default='0')
+    rating_avg = db.Column(db.Float, index=True)  # NULL until the first rating
+    rating_1 = db.Column(db.Integer, default=0, server_default='0')
+    rating_2 = db.Column(db.Integer, default=0, server_default='0')
+    rating_3 = db.Column(db.Integer, default=0, server_default='0')
+    rating_4 = db.Column(db.Integer, default=0, server_default='0')
+    rating_5 = db.Column(db.Integer, default=0, server_default='0')
+
+    __table_args__ = (
+        # Lets category listings sort professionals by rating without a table scan
+        db.Index('ix_user_category_rating', 'service_category_id', 'rating_avg'),
+    )
 
     # Relationships
     service_requests_customer = db.relationship('ServiceRequest', 
@@ -47,6 +65,14 @@ class User(db.Model, UserMixin):
     def is_customer(self):
         return self.user_type == 'customer'
 
+    @property
+    def average_rating(self):
+        return round(self.rating_avg, 2) if self.rating_avg is not None else None
+
+    @property
+    def rating_histogram(self):
+        return {stars: getattr(self, f'rating_{stars}') or 0 for stars in range(1, 6)}
+
 
 class ServiceCategory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -82,11 +108,19 @@ class ServiceRequest(db.Model):
     service_id = db.Column(db.Integer, db.ForeignKey('service.id'), nullable=False)
     status = db.Column(db.String(20), default='requested')  # requested, accepted, closed
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    completed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    accepted_at = db.Column(db.DateTime)  # Set when a professional takes the request
+    completed_at = db.Column(db.DateTime)  # Set when the customer closes the request
     rating = db.Column(db.Integer)
     review = db.Column(db.Text)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # At most one open request per customer and service, so double-submitted bookings cannot pile up
+        db.Index('uq_service_request_open', 'customer_id', 'service_id', unique=True,
+                 sqlite_where=status.in_(OPEN_REQUEST_STATUSES),
+                 postgresql_where=status.in_(OPEN_REQUEST_STATUSES)),
+    )
+
     # Many-to-many relationship for rejected professionals
     rejected_professionals = db.relationship(
         'User', 
@@ -99,4 +133,77 @@ rejected_requests_association = db.Table(
     'rejected_requests_association',
     db.Column('service_request_id', db.Integer, db.ForeignKey('service_request.id'), primary_key=True),
     db.Column('professional_id', db.Integer, db.ForeignKey('user.id'), primary_key=True)
-)
\ No newline at end of file
+)
+
+# Append-only log of every lifecycle transition (written in batches, see app/events.py)
+class ServiceRequestEvent(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    request_id = db.Column(db.Integer, nullable=False, index=True)  # No FK so the log outlives the request row
+    actor_id = db.Column(db.Integer)  # User who triggered the transition
+    event = db.Column(db.String(20), nullable=False)  # booked, accepted, rejected, completed, closed, ...
+    from_status = db.Column(db.String(20))
+    to_status = db.Column(db.String(20))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+# Closed requests moved out of service_request by app/archive.py. Rows keep their original id and
+# snapshot the names and price they were billed at, so the archive can live in its own database
+# file (the 'archive' bind) and still be summarized without joins.
+class ArchivedServiceRequest(db.Model):
+    __bind_key__ = 'archive'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    customer_id = db.Column(db.Integer, nullable=False, index=True)
+    professional_id = db.Column(db.Integer, index=True)
+    service_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20))
+    created_at = db.Column(db.DateTime)
+    accepted_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    rating = db.Column(db.Integer)
+    review = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime)
+
+    service_name = db.Column(db.String(100))
+    category_id = db.Column(db.Integer, index=True)
+    category_name = db.Column(db.String(100))
+    base_price = db.Column(db.Float)
+    customer_name = db.Column(db.String(100))
+    professional_name = db.Column(db.String(100))
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# Rejections of archived requests (from both rejected_request and rejected_requests_association)
+class ArchivedRejection(db.Model):
+    __bind_key__ = 'archive'
+
+    request_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    professional_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+
+# Results precomputed by background jobs (app/jobs.py) so pages can skip the expensive path
+class SummarySnapshot(db.Model):
+    key = db.Column(db.String(100), primary_key=True)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+# One row per background job: its schedule, concurrency limit, live run count and last outcome
+class ScheduledJob(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    interval_seconds = db.Column(db.Integer, nullable=False)
+    max_concurrency = db.Column(db.Integer, nullable=False, default=1)
+    enabled = db.Column(db.Boolean, nullable=False, default=True)
+    running = db.Column(db.Integer, nullable=False, default=0)  # Claimed and not yet finished
+    next_run_at = db.Column(db.DateTime, nullable=False)
+    last_status = db.Column(db.String(20))
+    last_duration_ms = db.Column(db.Integer)
+    last_finished_at = db.Column(db.DateTime)
+
+# Every job run with its timing; 'running' rows past lease_until are treated as crashed
+class JobRun(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    job_name = db.Column(db.String(50), nullable=False, index=True)
+    worker = db.Column(db.String(100))  # host:pid of the runner that claimed it
+    status = db.Column(db.String(20), nullable=False, default='running')  # running, succeeded, failed, expired
+    started_at = db.Column(db.DateTime, nullable=False)
+    lease_until = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime)
+    duration_ms = db.Column(db.Integer)
+    result = db.Column(db.Text)  # Summary line or error message
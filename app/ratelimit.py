@@ -0,0 +1,187 @@
+import math
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict, namedtuple
+
+from flask import Response, current_app, request, session
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+# capacity tokens, refilled at `rate` tokens per second; methods=None limits every method
+Limit = namedtuple('Limit', ['methods', 'capacity', 'rate'])
+
+
+def parse_limit(value):
+    """Parse ``'[METHOD[,METHOD]] count/period'``, e.g. ``'POST 10/minute'``."""
+    methods, _, rate = value.strip().rpartition(' ')
+    count, _, period = rate.partition('/')
+    capacity = int(count)
+    return Limit(
+        frozenset(methods.upper().split(',')) if methods else None,
+        capacity,
+        capacity / PERIODS[period]
+    )
+
+
+def _refill(bucket, limit, now):
+    tokens, updated = bucket if bucket is not None else (limit.capacity, now)
+    return min(limit.capacity, tokens + (now - updated) * limit.rate)
+
+
+def _take(buckets, keys, limit, now):
+    # Spend one token from every bucket, or from none of them
+    tokens = [_refill(buckets.get(key), limit, now) for key in keys]
+    allowed = min(tokens) >= 1
+    if allowed:
+        tokens = [value - 1 for value in tokens]
+    retry_after = 0 if allowed else (1 - min(tokens)) / limit.rate
+    return allowed, retry_after, {key: (value, now) for key, value in zip(keys, tokens)}
+
+
+class MemoryStore:
+    """Token buckets for this process only, oldest keys evicted past ``max_keys``."""
+
+    def __init__(self, max_keys=100000):
+        self.buckets = OrderedDict()
+        self.stats = Counter()
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+
+    def take(self, endpoint, keys, limit, now):
+        with self.lock:
+            allowed, retry_after, updates = _take(self.buckets, keys, limit, now)
+            for key, bucket in updates.items():
+                self.buckets.pop(key, None)
+                self.buckets[key] = bucket
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+            self.stats[endpoint, 'allowed' if allowed else 'throttled'] += 1
+        return allowed, retry_after
+
+    def metrics(self):
+        with self.lock:
+            return dict(self.stats)
+
+
+class SQLiteStore:
+    """Token buckets in a local SQLite file shared by every worker on the host.
+
+    Each check is one short ``BEGIN IMMEDIATE`` transaction that also bumps
+    the counters, so it costs a single write.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        # Throwaway connection: connections must not be inherited by forked workers
+        connection = sqlite3.connect(path)
+        with connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS ratelimit_bucket '
+                '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+            )
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS ratelimit_stat '
+                '(endpoint TEXT NOT NULL, outcome TEXT NOT NULL, count INTEGER NOT NULL, '
+                'PRIMARY KEY (endpoint, outcome))'
+            )
+        connection.close()
+
+    def _connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self.local.connection = connection
+        return connection
+
+    def take(self, endpoint, keys, limit, now):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            buckets = {
+                key: (tokens, updated) for key, tokens, updated in connection.execute(
+                    f'SELECT key, tokens, updated FROM ratelimit_bucket WHERE key IN ({",".join("?" * len(keys))})',
+                    keys
+                )
+            }
+            allowed, retry_after, updates = _take(buckets, keys, limit, now)
+            connection.executemany(
+                'INSERT OR REPLACE INTO ratelimit_bucket (key, tokens, updated) VALUES (?, ?, ?)',
+                [(key, tokens, updated) for key, (tokens, updated) in updates.items()]
+            )
+            connection.execute(
+                'INSERT INTO ratelimit_stat (endpoint, outcome, count) VALUES (?, ?, 1) '
+                'ON CONFLICT (endpoint, outcome) DO UPDATE SET count = count + 1',
+                (endpoint, 'allowed' if allowed else 'throttled')
+            )
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return allowed, retry_after
+
+    def metrics(self):
+        rows = self._connection().execute('SELECT endpoint, outcome, count FROM ratelimit_stat')
+        return {(endpoint, outcome): count for endpoint, outcome, count in rows}
+
+    def prune(self, older_than_seconds=86400):
+        # Buckets idle this long are full again; dropping them changes nothing
+        connection = self._connection()
+        cursor = connection.execute(
+            'DELETE FROM ratelimit_bucket WHERE updated < ?', (time.time() - older_than_seconds,)
+        )
+        return cursor.rowcount
+
+
+class RateLimiter:
+    def __init__(self, limits, store):
+        self.limits = {endpoint: parse_limit(value) for endpoint, value in limits.items()}
+        self.store = store
+
+    def check(self):
+        """``before_request`` hook: answer 429 before the view, or any DB query, runs."""
+        limit = self.limits.get(request.endpoint)
+        if limit is None or (limit.methods is not None and request.method not in limit.methods):
+            return None
+
+        keys = [f'{request.endpoint}:ip:{request.remote_addr}']
+        # The user id comes straight from the session cookie; loading current_user would hit the DB
+        user_id = session.get('_user_id')
+        if user_id is not None:
+            keys.append(f'{request.endpoint}:user:{user_id}')
+
+        try:
+            allowed, retry_after = self.store.take(request.endpoint, keys, limit, time.time())
+        except sqlite3.OperationalError:
+            # A busy shared store must not take the site down with it
+            current_app.logger.warning('Rate limit store unavailable; admitting request.')
+            return None
+        if allowed:
+            return None
+        return Response(
+            'Too many requests. Please slow down and try again shortly.\n', status=429,
+            mimetype='text/plain', headers={'Retry-After': str(max(math.ceil(retry_after), 1))}
+        )
+
+    def metrics(self):
+        metrics = {endpoint: {'allowed': 0, 'throttled': 0} for endpoint in self.limits}
+        for (endpoint, outcome), count in self.store.metrics().items():
+            metrics.setdefault(endpoint, {'allowed': 0, 'throttled': 0})[outcome] = count
+        return metrics
+
+
+def init_rate_limits(app):
+    # A misspelt endpoint would otherwise leave that route silently unlimited
+    unknown = sorted(set(app.config['RATELIMITS']) - set(app.view_functions))
+    if unknown:
+        raise ValueError(f'RATELIMITS names unknown endpoints: {", ".join(unknown)}')
+    if not app.config['RATELIMIT_ENABLED']:
+        return
+    path = app.config['RATELIMIT_STORAGE_PATH']
+    store = SQLiteStore(path) if path else MemoryStore()
+    limiter = RateLimiter(app.config['RATELIMITS'], store)
+    app.extensions['ratelimit'] = limiter
+    app.before_request(limiter.check)
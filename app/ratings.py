@@ -0,0 +1,83 @@
+from sqlalchemy import Float, case, cast, func
+
+from app import db
+from app.models import ArchivedServiceRequest, ServiceRequest, User
+
+RATING_VALUES = range(1, 6)
+
+
+def valid_rating(rating):
+    return rating if rating in RATING_VALUES else None
+
+
+def apply_rating(professional_id, new_rating, old_rating=None):
+    """Fold a new (or changed) rating into the professional's aggregates.
+
+    Runs as a single UPDATE built from column arithmetic, so concurrent
+    feedback for the same professional cannot lose increments.
+    """
+    new_rating, old_rating = valid_rating(new_rating), valid_rating(old_rating)
+    if not professional_id or new_rating == old_rating:
+        return
+
+    sum_delta = (new_rating or 0) - (old_rating or 0)
+    count_delta = (new_rating is not None) - (old_rating is not None)
+    new_sum = User.rating_sum + sum_delta
+    new_count = User.rating_count + count_delta
+
+    values = {
+        'rating_sum': new_sum,
+        'rating_count': new_count,
+        # SET expressions see the pre-update row, so the average uses the new totals
+        'rating_avg': case((new_count > 0, cast(new_sum, Float) / new_count), else_=None),
+    }
+    if old_rating is not None:
+        values[f'rating_{old_rating}'] = getattr(User, f'rating_{old_rating}') - 1
+    if new_rating is not None:
+        values[f'rating_{new_rating}'] = getattr(User, f'rating_{new_rating}') + 1
+
+    User.query.filter_by(id=professional_id).update(values, synchronize_session=False)
+
+
+def rebuild_rating_aggregates():
+    # Full recomputation, used to backfill existing data or repair drift.
+    # Archived ratings can no longer change, so they are read before the write transaction starts
+    rows = db.session.query(
+        ArchivedServiceRequest.professional_id, ArchivedServiceRequest.rating, func.count(ArchivedServiceRequest.id)
+    ).filter(
+        ArchivedServiceRequest.professional_id.isnot(None),
+        ArchivedServiceRequest.rating.in_(list(RATING_VALUES))
+    ).group_by(ArchivedServiceRequest.professional_id, ArchivedServiceRequest.rating).all()
+
+    # Write first, read second: the reset locks the professionals' rows (the whole database on
+    # SQLite), so an apply_rating that commits concurrently either lands before the read below
+    # and is counted, or waits and is applied on top of the rebuilt totals. Reading first would
+    # let it commit in between and be overwritten.
+    User.query.filter_by(user_type='professional').update({
+        'rating_sum': 0, 'rating_count': 0, 'rating_avg': None,
+        **{f'rating_{stars}': 0 for stars in RATING_VALUES},
+    }, synchronize_session=False)
+    rows += db.session.query(
+        ServiceRequest.professional_id, ServiceRequest.rating, func.count(ServiceRequest.id)
+    ).filter(
+        ServiceRequest.professional_id.isnot(None),
+        ServiceRequest.rating.in_(list(RATING_VALUES))
+    ).group_by(ServiceRequest.professional_id, ServiceRequest.rating).all()
+
+    aggregates = {}
+    for professional_id, rating, count in rows:
+        entry = aggregates.setdefault(professional_id, {f'rating_{stars}': 0 for stars in RATING_VALUES})
+        entry[f'rating_{rating}'] += count
+
+    updates = []
+    for professional_id, entry in aggregates.items():
+        total = sum(entry[f'rating_{stars}'] * stars for stars in RATING_VALUES)
+        count = sum(entry.values())
+        updates.append({
+            'id': professional_id, 'rating_sum': total, 'rating_count': count,
+            'rating_avg': total / count, **entry,
+        })
+    if updates:
+        db.session.execute(db.update(User), updates)
+    db.session.commit()
+    return len(updates)
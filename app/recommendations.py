@@ -0,0 +1,233 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import func
+
+from app import db
+from app.geo import EARTH_RADIUS_KM, get_pin_index
+from app.models import ArchivedRejection, ArchivedServiceRequest, RejectedRequest, ServiceRequest, User
+
+logger = logging.getLogger(__name__)
+
+Recommendation = namedtuple('Recommendation', ['professional_id', 'fullname', 'score'])
+
+OPEN_STATUSES = ['accepted', 'in_progress']
+PIN_DIGITS = 6
+PROXIMITY_SCALE_KM = 10.0  # Distance at which the proximity score halves
+
+# Ratings are shrunk towards this prior so one 5-star review does not top the list
+RATING_PRIOR_MEAN = 3.5
+RATING_PRIOR_WEIGHT = 5
+
+
+def parse_pin(pin_code):
+    pin_code = (pin_code or '').strip()
+    return int(pin_code) if pin_code.isdigit() and len(pin_code) == PIN_DIGITS else -1
+
+
+class CategoryCandidates:
+    """Column arrays describing every approved professional in one category."""
+
+    def __init__(self, ids, names, pins, rating_sum, rating_count, workload, rejections, accepted,
+                 latitudes=None, longitudes=None):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.names = list(names)
+        self.pins = np.asarray(pins, dtype=np.int64)
+        self.rating_sum = np.asarray(rating_sum, dtype=np.float64)
+        self.rating_count = np.asarray(rating_count, dtype=np.float64)
+        self.workload = np.asarray(workload, dtype=np.int64)
+        self.rejections = np.asarray(rejections, dtype=np.int64)
+        self.accepted = np.asarray(accepted, dtype=np.int64)
+        # Coordinates in radians, NaN where the pin code is not in the reference table
+        unknown = np.full(len(self.ids), np.nan)
+        self.latitudes = unknown if latitudes is None else np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = unknown if longitudes is None else np.asarray(longitudes, dtype=np.float64)
+        self.located = np.isfinite(self.latitudes) & np.isfinite(self.longitudes)
+        self.positions = {int(professional_id): index for index, professional_id in enumerate(self.ids)}
+        self.built_at = time.monotonic()
+
+    def proximity(self, pin_code, origin=None):
+        proximity = np.zeros(len(self.ids))
+
+        # Real distance wherever both ends have known coordinates
+        fallback = np.ones(len(self.ids), dtype=bool)
+        if origin is not None:
+            located = self.located
+            distances = _planar_distance_km(origin, self.latitudes[located], self.longitudes[located])
+            proximity[located] = 1.0 / (1.0 + distances / PROXIMITY_SCALE_KM)
+            fallback = ~located
+
+        # Otherwise the length of the shared leading-digit prefix of the PIN codes, scaled to 0..1
+        customer_pin = parse_pin(pin_code)
+        if customer_pin >= 0 and fallback.any():
+            pins = self.pins[fallback]
+            shared = np.zeros(len(pins))
+            for digits in range(1, PIN_DIGITS + 1):
+                divisor = 10 ** (PIN_DIGITS - digits)
+                shared += (pins // divisor) == (customer_pin // divisor)
+            shared[pins < 0] = 0
+            proximity[fallback] = shared / PIN_DIGITS
+        return proximity
+
+    def scores(self, pin_code, weights, origin=None):
+        rating = (self.rating_sum + RATING_PRIOR_MEAN * RATING_PRIOR_WEIGHT) / \
+            (self.rating_count + RATING_PRIOR_WEIGHT) / 5.0
+        load = 1.0 / (1.0 + self.workload)
+        reliability = 1.0 - self.rejections / np.maximum(self.rejections + self.accepted, 1)
+        return (
+            weights['proximity'] * self.proximity(pin_code, origin)
+            + weights['rating'] * rating
+            + weights['workload'] * load
+            + weights['reliability'] * reliability
+        )
+
+    def top(self, pin_code, weights, k, origin=None):
+        if not len(self.ids):
+            return []
+        scores = self.scores(pin_code, weights, origin)
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return [
+            Recommendation(int(self.ids[index]), self.names[index], round(float(scores[index]), 4))
+            for index in best
+        ]
+
+    def adjust(self, professional_id, workload=0, rejections=0, accepted=0):
+        index = self.positions.get(professional_id)
+        if index is not None:
+            self.workload[index] = max(self.workload[index] + workload, 0)
+            self.rejections[index] += rejections
+            self.accepted[index] += accepted
+
+
+# Candidate structures per service category. Requests only ever read them: once they are older than
+# RECOMMENDATION_REFRESH_SECONDS, the next request queues a rebuild on the background thread and
+# keeps using the stale arrays until it lands.
+_candidates = {}
+_refreshing = set()
+_lock = threading.Lock()
+_refresher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='recommendations')
+
+
+def recommend_professionals(category_id, pin_code, k=None):
+    """Return the top-k approved professionals in ``category_id`` for a customer at ``pin_code``.
+
+    Empty until this process has built the category's arrays for the first time.
+    """
+    config = current_app.config
+    candidates = get_candidates(category_id)
+    if candidates is None:
+        return []
+    return candidates.top(
+        pin_code, config['RECOMMENDATION_WEIGHTS'], k or config['RECOMMENDATION_TOP_K'],
+        origin=_radians(get_pin_index().coordinates((pin_code or '').strip()))
+    )
+
+
+def _planar_distance_km(origin, latitudes, longitudes):
+    # Equirectangular approximation: ~4x cheaper than haversine and accurate at city scale,
+    # where the proximity score actually varies
+    x = (longitudes - origin[1]) * np.cos(origin[0])
+    y = latitudes - origin[0]
+    return EARTH_RADIUS_KM * np.sqrt(x * x + y * y)
+
+
+def _radians(coordinates):
+    return None if coordinates is None else tuple(np.radians(coordinates))
+
+
+def get_candidates(category_id):
+    """The category's cached arrays, or None before the first build; queues a rebuild when stale."""
+    candidates = _candidates.get(category_id)
+    max_age = current_app.config['RECOMMENDATION_REFRESH_SECONDS']
+    if candidates is None or time.monotonic() - candidates.built_at > max_age:
+        refresh_category(category_id)
+    return candidates
+
+
+def refresh_category(category_id):
+    with _lock:
+        if category_id in _refreshing:
+            return
+        _refreshing.add(category_id)
+    _refresher.submit(_rebuild, current_app._get_current_object(), category_id)
+
+
+def _rebuild(app, category_id):
+    try:
+        with app.app_context():
+            _candidates[category_id] = build_candidates(category_id)
+    except Exception:
+        logger.exception('Rebuilding recommendations for category %s failed', category_id)
+    finally:
+        with _lock:
+            _refreshing.discard(category_id)
+
+
+def build_candidates(category_id):
+    professionals = db.session.query(
+        User.id, User.fullname, User.pin_code, User.rating_sum, User.rating_count
+    ).filter(
+        User.user_type == 'professional',
+        User.status == 'approved',
+        User.service_category_id == category_id
+    ).order_by(User.id).all()
+    in_category = db.session.query(User.id).filter(
+        User.user_type == 'professional',
+        User.service_category_id == category_id
+    )
+
+    workload = dict(db.session.query(ServiceRequest.professional_id, func.count(ServiceRequest.id)).filter(
+        ServiceRequest.professional_id.in_(in_category),
+        ServiceRequest.status.in_(OPEN_STATUSES)
+    ).group_by(ServiceRequest.professional_id).all())
+    accepted = dict(db.session.query(ServiceRequest.professional_id, func.count(ServiceRequest.id)).filter(
+        ServiceRequest.professional_id.in_(in_category)
+    ).group_by(ServiceRequest.professional_id).all())
+    rejections = dict(db.session.query(RejectedRequest.professional_id, func.count(RejectedRequest.id)).filter(
+        RejectedRequest.professional_id.in_(in_category)
+    ).group_by(RejectedRequest.professional_id).all())
+
+    # History moved to the archive still counts towards reliability. The archive may be another
+    # database, so filter it by the ids already loaded instead of a cross-database subquery.
+    ids = [row.id for row in professionals]
+    for counts, model in ((accepted, ArchivedServiceRequest), (rejections, ArchivedRejection)):
+        for professional_id, count in db.session.query(model.professional_id, func.count()).filter(
+                model.professional_id.in_(ids)).group_by(model.professional_id).all():
+            counts[professional_id] = counts.get(professional_id, 0) + count
+
+    index = get_pin_index()
+    coordinates = [_radians(index.coordinates((row.pin_code or '').strip())) or (np.nan, np.nan)
+                   for row in professionals]
+
+    return CategoryCandidates(
+        ids=[row.id for row in professionals],
+        names=[row.fullname for row in professionals],
+        pins=[parse_pin(row.pin_code) for row in professionals],
+        rating_sum=[row.rating_sum or 0 for row in professionals],
+        rating_count=[row.rating_count or 0 for row in professionals],
+        workload=[workload.get(row.id, 0) for row in professionals],
+        rejections=[rejections.get(row.id, 0) for row in professionals],
+        accepted=[accepted.get(row.id, 0) for row in professionals],
+        latitudes=[latitude for latitude, _ in coordinates],
+        longitudes=[longitude for _, longitude in coordinates],
+    )
+
+
+def note_transition(professional, workload=0, rejections=0, accepted=0):
+    # Keep this process's cached arrays current between rebuilds
+    candidates = _candidates.get(professional.service_category_id)
+    if candidates is not None:
+        candidates.adjust(professional.id, workload=workload, rejections=rejections, accepted=accepted)
+
+
+def invalidate_category(category_id=None):
+    # Rebuild now rather than at the next refresh; requests keep the current arrays meanwhile
+    for category_id in list(_candidates) if category_id is None else [category_id]:
+        refresh_category(category_id)
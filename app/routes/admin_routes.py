@@ -1,10 +1,19 @@
 # Define blueprints for modular routes - chatgpt se uthaya
-from flask import Blueprint, flash, redirect, render_template, request, url_for
+from datetime import datetime
+from flask import Blueprint, current_app, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 from app import db
-from app.models import Service, ServiceCategory, ServiceRequest, User
+from app.archive import archived_count, archived_counts_by, merge_counts
+from app.bulk import parse_ids, set_professional_status, summarize
+from app.events import transition
+from app.idempotency import idempotent
+from app.models import ArchivedServiceRequest, Service, ServiceCategory, ServiceRequest, User
+from app.routing import replica_reads
+from app.snapshots import admin_trend_data
+from app.viewmodels import professional_rows, request_rows
 from .auth_routes import redirect_to_dashboard
 from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
 from flask import jsonify
 
 
@@ -12,41 +21,55 @@ admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
 # Admin Dashboard Route
 @admin_bp.route('/dashboard', methods=['GET', 'POST'])
+@idempotent
 @login_required
+@replica_reads
 def admin_dashboard():
     if current_user.user_type != 'admin':
         flash('Access denied.', 'danger')
         return redirect_to_dashboard()
 
-    # Fetch all professionals (approved, rejected, and pending)
-    professionals = User.query.filter_by(user_type='professional').all()
-    pending_professionals = User.query.filter_by(user_type='professional', status='pending').all()
+    # Handle POST request for changing status, then redirect so the dashboard is rendered by a GET
+    if request.method == 'POST':
+        service_request_id = request.form.get('service_request_id')
+        new_status = request.form.get('status')
+
+        if service_request_id and new_status:
+            service_request = ServiceRequest.query.get(service_request_id)
+            if service_request:
+                previous_status = service_request.status
+                transition(service_request, new_status, current_user.id, event_name='admin_status')
+                try:
+                    db.session.commit()
+                except IntegrityError:
+                    # Re-opening would give the customer two open requests for one service
+                    db.session.rollback()
+                    flash('The customer already has an open request for this service.', 'warning')
+                    return redirect(url_for('admin.admin_dashboard'))
+                from app.recommendations import OPEN_STATUSES, note_transition
+                workload = (new_status in OPEN_STATUSES) - (previous_status in OPEN_STATUSES)
+                if service_request.professional and workload:
+                    note_transition(service_request.professional, workload=workload)
+                flash(f"Service request status updated to {new_status}.", 'success')
+        return redirect(url_for('admin.admin_dashboard'))
+
+    # Fetch all professionals (approved, rejected, and pending) as lightweight rows
+    professionals = professional_rows(order_by=User.id)
+    pending_professionals = [professional for professional in professionals if professional.status == 'pending']
 
     # Fetch all services
     services = Service.query.join(ServiceCategory).all()
 
     # Fetch all service requests
-    service_requests = ServiceRequest.query.join(Service).join(User, ServiceRequest.professional_id == User.id, isouter=True).all()
+    service_requests = request_rows(order_by=ServiceRequest.id)
 
     # Count service requests by their status (accepted and closed are used instead of in_progress and completed)
     status_counts = {
         'pending': ServiceRequest.query.filter_by(status='pending').count(),
         'accepted': ServiceRequest.query.filter_by(status='accepted').count(),
-        'closed': ServiceRequest.query.filter_by(status='closed').count(),
+        'closed': ServiceRequest.query.filter_by(status='closed').count() + archived_count(),
     }
 
-    # Handle POST request for changing status
-    if request.method == 'POST':
-        service_request_id = request.form.get('service_request_id')
-        new_status = request.form.get('status')
-
-        if service_request_id and new_status:
-            service_request = ServiceRequest.query.get(service_request_id)
-            if service_request:
-                service_request.status = new_status
-                db.session.commit()
-                flash(f"Service request status updated to {new_status}.", 'success')
-
     return render_template(
         'admin/dashboard.html',
         users=professionals,
@@ -62,6 +85,7 @@ def admin_dashboard():
 # Admin Search Route
 @admin_bp.route('/search', methods=['GET', 'POST'])
 @login_required
+@replica_reads
 def admin_search():
     if current_user.user_type != 'admin':
         flash('Access denied.', 'danger')
@@ -122,6 +146,7 @@ def admin_search():
 # Admin Summary Route
 @admin_bp.route('/summary')
 @login_required
+@replica_reads
 def admin_summary():
     if current_user.user_type != 'admin':
         flash('Access denied.', 'danger')
@@ -131,7 +156,7 @@ def admin_summary():
     total_customers = User.query.filter_by(user_type='customer').count()
     total_professionals = User.query.filter_by(user_type='professional').count()
     total_services = Service.query.count()
-    total_service_requests = ServiceRequest.query.count()
+    total_service_requests = ServiceRequest.query.count() + archived_count()
 
     # Fetch service requests by status (for pie chart)
     status_data = (
@@ -139,7 +164,7 @@ def admin_summary():
         .group_by(ServiceRequest.status)
         .all()
     )
-    status_data = {status: count for status, count in status_data}
+    status_data = merge_counts(dict(status_data), archived_counts_by(ArchivedServiceRequest.status))
 
     # Fetch requests by service category (for bar chart)
     service_category_data = (
@@ -149,7 +174,13 @@ def admin_summary():
         .group_by(ServiceCategory.name)
         .all()
     )
-    service_category_data = {category: count for category, count in service_category_data}
+    service_category_data = merge_counts(
+        dict(service_category_data), archived_counts_by(ArchivedServiceRequest.category_name)
+    )
+
+    # Daily/weekly trends, turnaround percentiles and revenue per category
+    days = min(max(request.args.get('days', 90, type=int), 1), 3650)
+    trends = admin_trend_data(days)
 
     return render_template(
         'admin/summary.html',
@@ -158,14 +189,39 @@ def admin_summary():
         total_services=total_services,
         total_service_requests=total_service_requests,
         status_data=status_data,
-        service_data=service_category_data
+        service_data=service_category_data,
+        trends=trends
     )
 
 
+# Trend data for admin charts over long histories (JSON)
+@admin_bp.route('/trends')
+@login_required
+@replica_reads
+def admin_trends():
+    if current_user.user_type != 'admin':
+        return jsonify({'error': 'Access denied.'}), 403
+
+    days = min(max(request.args.get('days', 365, type=int), 1), 3650)
+    return jsonify(admin_trend_data(days))
+
+
+# Allowed/throttled request counts per rate-limited endpoint (JSON)
+@admin_bp.route('/rate-limits')
+@login_required
+def admin_rate_limits():
+    if current_user.user_type != 'admin':
+        return jsonify({'error': 'Access denied.'}), 403
+
+    limiter = current_app.extensions.get('ratelimit')
+    return jsonify(limiter.metrics() if limiter else {})
+
+
 
 
 
 @admin_bp.route('/approve/<int:user_id>', methods=['POST'])
+@idempotent
 @login_required
 def approve_professional(user_id):
     if current_user.user_type != 'admin':
@@ -175,12 +231,16 @@ def approve_professional(user_id):
     user = User.query.get_or_404(user_id)
     if user.user_type == 'professional' and user.status != 'approved':
         user.status = 'approved'
+        user.rejected_at = None
         db.session.commit()
+        from app.recommendations import invalidate_category
+        invalidate_category(user.service_category_id)
         flash(f"Professional {user.fullname} approved successfully!", 'success')
     return redirect(url_for('admin.admin_dashboard'))
 
 
 @admin_bp.route('/reject/<int:user_id>', methods=['POST'])
+@idempotent
 @login_required
 def reject_professional(user_id):
     if current_user.user_type != 'admin':
@@ -190,11 +250,40 @@ def reject_professional(user_id):
     user = User.query.get_or_404(user_id)
     if user.user_type == 'professional' and user.status != 'rejected':
         user.status = 'rejected'
+        user.rejected_at = datetime.utcnow()
         db.session.commit()
+        from app.recommendations import invalidate_category
+        invalidate_category(user.service_category_id)
         flash(f"Professional {user.fullname} rejected successfully!", 'success')
     return redirect(url_for('admin.admin_dashboard'))
 
+
+# Approve or reject many professionals at once (multi-select on the dashboard)
+@admin_bp.route('/professionals/bulk', methods=['POST'])
+@idempotent
+@login_required
+def bulk_professionals():
+    if current_user.user_type != 'admin':
+        flash('Access denied.', 'danger')
+        return redirect(url_for('admin.admin_dashboard'))
+
+    statuses = {'approve': 'approved', 'reject': 'rejected'}
+    action = request.form.get('action')
+    user_ids = parse_ids(request.form.getlist('user_ids'))
+    if action not in statuses or not user_ids:
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify({'error': 'Choose an action and at least one professional.'}), 400
+        flash('Choose an action and at least one professional.', 'warning')
+        return redirect(url_for('admin.admin_dashboard'))
+
+    results = set_professional_status(user_ids, statuses[action])
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({'results': results})
+    flash(f'Professionals: {summarize(results, statuses[action])}.', 'success')
+    return redirect(url_for('admin.admin_dashboard'))
+
 @admin_bp.route('/create-service', methods=['GET', 'POST'])
+@idempotent
 def create_service():
     if request.method == 'POST':
         service_name = request.form['service_name']
@@ -226,6 +315,7 @@ def create_service():
 
 
 @admin_bp.route('/edit-service/<int:service_id>', methods=['GET', 'POST'])
+@idempotent
 @login_required
 def edit_service(service_id):
     if current_user.user_type != 'admin':
@@ -246,6 +336,7 @@ def edit_service(service_id):
     return render_template('admin/edit_service.html', service=service)
 
 @admin_bp.route('/delete-service/<int:service_id>', methods=['POST'])
+@idempotent
 @login_required
 def delete_service(service_id):
     if current_user.user_type != 'admin':
@@ -3,8 +3,14 @@ from flask_login import current_user, login_required
 from datetime import datetime, timedelta
 
 from sqlalchemy import func
-from app.models import Service, ServiceCategory, ServiceRequest, User
+from sqlalchemy.exc import IntegrityError
+from app.models import ArchivedServiceRequest, Service, ServiceCategory, ServiceRequest, User
 from app import db
+from app.archive import archived_counts_by, archived_ratings_by, archived_totals, merge_counts
+from app.events import record_event, transition
+from app.idempotency import idempotent
+from app.ratings import apply_rating, valid_rating
+from app.routing import replica_reads
 from .auth_routes import redirect_to_dashboard
 
 customer_bp = Blueprint('customer', __name__, url_prefix='/customer')
@@ -12,6 +18,7 @@ customer_bp = Blueprint('customer', __name__, url_prefix='/customer')
 # Customer Dashboard Route
 @customer_bp.route('/dashboard')
 @login_required
+@replica_reads
 def customer_dashboard():
     if current_user.user_type != 'customer':
         flash('Access denied.', 'danger')
@@ -23,10 +30,17 @@ def customer_dashboard():
     # Fetch service requests for the current customer
     service_requests = ServiceRequest.query.filter_by(customer_id=current_user.id).all()
 
+    # Old closed requests are only read from the archive when asked for
+    archived_requests = None
+    if request.args.get('include_archived', type=int):
+        archived_requests = ArchivedServiceRequest.query.filter_by(customer_id=current_user.id) \
+            .order_by(ArchivedServiceRequest.id.desc()).all()
+
     return render_template(
         'customer/dashboard.html',
         categories=service_categories,
-        service_requests=service_requests
+        service_requests=service_requests,
+        archived_requests=archived_requests
     )
 
 
@@ -47,6 +61,7 @@ def services_in_category(category_id):
 
 # Book a Service
 @customer_bp.route('/book/<int:service_id>', methods=['POST'])
+@idempotent
 @login_required
 def book_service(service_id):
     if current_user.user_type != 'customer':
@@ -63,23 +78,30 @@ def book_service(service_id):
         created_at=datetime.utcnow()
     )
     db.session.add(service_request)
-    db.session.commit()
+    record_event(service_request, 'booked', None, 'requested', current_user.id)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # uq_service_request_open: this customer already has an open request for the service
+        db.session.rollback()
+        flash(f'You already have an open request for "{service.name}".', 'warning')
+        return redirect(url_for('customer.customer_dashboard'))
 
-    # Notify professionals in the service's category
-    professionals = User.query.filter_by(
-        user_type='professional',
-        service_category_id=service.category_id,
-        status='approved'
-    ).all()
+    flash(f'Service "{service.name}" has been requested successfully!', 'success')
 
-    # Here you can implement a notification system to inform professionals
+    # Suggest the best matching professionals in the service's category
+    from app.recommendations import recommend_professionals  # Deferred: pulls in numpy
+    recommended = recommend_professionals(service.category_id, current_user.pin_code)
+    if recommended:
+        names = ', '.join(professional.fullname for professional in recommended)
+        flash(f'Recommended professionals for this request: {names}', 'info')
 
-    flash(f'Service "{service.name}" has been requested successfully!', 'success')
     return redirect(url_for('customer.customer_dashboard'))
 
 
 # Close a Service Request
 @customer_bp.route('/close_request/<int:request_id>', methods=['POST'])
+@idempotent
 @login_required
 def close_request(request_id):
     service_request = ServiceRequest.query.get_or_404(request_id)
@@ -95,8 +117,11 @@ def close_request(request_id):
         return redirect(url_for('customer.customer_dashboard'))
 
     # Mark the service as completed
-    service_request.status = 'completed'
+    transition(service_request, 'completed', current_user.id)
     db.session.commit()
+    if service_request.professional:
+        from app.recommendations import note_transition
+        note_transition(service_request.professional, workload=-1)
 
     # Redirect to feedback form
     flash('Service marked as completed. Please provide feedback.', 'success')
@@ -107,6 +132,7 @@ def close_request(request_id):
 
 # Feedback Form
 @customer_bp.route('/feedback/<int:request_id>', methods=['GET', 'POST'])
+@idempotent
 @login_required
 def feedback_form(request_id):
     service_request = ServiceRequest.query.get_or_404(request_id)
@@ -116,10 +142,12 @@ def feedback_form(request_id):
         return redirect(url_for('customer.customer_dashboard'))
 
     if request.method == 'POST':
-        # Save feedback
-        service_request.rating = request.form.get('rating', type=int)
+        # Save feedback and fold the rating into the professional's aggregates
+        previous_rating = service_request.rating
+        service_request.rating = valid_rating(request.form.get('rating', type=int))
+        apply_rating(service_request.professional_id, service_request.rating, previous_rating)
         service_request.review = request.form.get('review', type=str)
-        service_request.status = 'closed'
+        transition(service_request, 'closed', current_user.id, event_name='feedback')
         db.session.commit()
 
         flash('Thank you for your feedback!', 'success')
@@ -135,49 +163,30 @@ def search():
 
     results = []
 
-    if search_type == 'service_name':
-        # Query services by name
-        services = Service.query.filter(Service.name.ilike(f'%{search_query}%')).all()
-
-        # Iterate through each service and get the unique professionals for that service
-        for service in services:
-            professionals = set()  # To store unique professionals for the service
-            for service_request in service.requests:
-                professional = service_request.professional
-                if professional and professional not in professionals:
-                    professionals.add(professional)
-                    # Check if the professional has valid data (experience, address)
-                    if professional.address and professional.experience:
-                        results.append({
-                            'service': service,
-                            'professional': professional
-                        })
-
-    elif search_type == 'pin_code':
-        # Query users by pin code and join with service request and services
-        users = User.query.filter(User.pin_code.like(f'%{search_query}%')) \
-            .join(ServiceRequest, User.id == ServiceRequest.professional_id) \
-            .join(Service, ServiceRequest.service_id == Service.id).all()
-
-        # Collect unique professional-service pairs
-        for user in users:
-            for service_request in user.service_requests_professional:
-                professional = user
-                if professional.address and professional.experience:
-                    if {
-                        'service': service_request.service,
-                        'professional': professional
-                    } not in results:
-                        results.append({
-                            'service': service_request.service,
-                            'professional': professional
-                        })
+    if search_type in ('service_name', 'pin_code') and search_query:
+        # Unique professional-service pairs from past requests, best rated first
+        query = db.session.query(Service, User) \
+            .join(ServiceRequest, ServiceRequest.service_id == Service.id) \
+            .join(User, ServiceRequest.professional_id == User.id) \
+            .filter(User.address.isnot(None), User.address != '', User.experience > 0)
+
+        if search_type == 'service_name':
+            query = query.filter(Service.name.ilike(f'%{search_query}%'))
+        else:
+            # Professionals located within the chosen radius of the pin code
+            from app.geo import nearby_pin_codes
+            radius_km = request.args.get('radius_km', type=float)
+            query = query.filter(User.pin_code.in_(nearby_pin_codes(search_query, radius_km)))
+
+        pairs = query.distinct().order_by(User.rating_avg.desc().nullslast(), User.fullname).all()
+        results = [{'service': service, 'professional': professional} for service, professional in pairs]
 
     return render_template('customer/search.html', results=results)
 
 
 
 @customer_bp.route('/summary', endpoint='customer_summary')
+@replica_reads
 def summary():
     customer_id = current_user.id
 
@@ -186,20 +195,26 @@ def summary():
         ServiceRequest.customer_id == customer_id,
         ServiceRequest.status.in_(['accepted', 'in_progress', 'completed', 'closed'])
     )
-    total_services = total_services_query.count()
+    archived = archived_totals(customer_id=customer_id)  # Archived requests are all closed
+    total_services = total_services_query.count() + archived['count']
 
     # Total Expenditure
     total_expenditure = db.session.query(func.sum(Service.base_price)).join(ServiceRequest).filter(
         ServiceRequest.customer_id == customer_id,
         ServiceRequest.status.in_(['accepted', 'in_progress', 'completed', 'closed'])
     ).scalar() or 0
+    total_expenditure += archived['revenue']
 
     # Average Rating
-    average_rating = db.session.query(func.avg(ServiceRequest.rating)).filter(
+    rating_sum, rating_count = db.session.query(
+        func.coalesce(func.sum(ServiceRequest.rating), 0), func.count(ServiceRequest.rating)
+    ).filter(
         ServiceRequest.customer_id == customer_id,
         ServiceRequest.status.in_(['completed', 'closed']),
         ServiceRequest.rating.isnot(None)
-    ).scalar() or 0
+    ).one()
+    rating_count += archived['rating_count']
+    average_rating = (rating_sum + archived['rating_sum']) / rating_count if rating_count else 0
 
     # Pie Chart: Service Status
     service_status_distribution = db.session.query(
@@ -222,21 +237,31 @@ def summary():
     # Bar Chart: Average Ratings of Professionals
     professional_ratings = db.session.query(
         User.fullname,
-        func.avg(ServiceRequest.rating)
+        func.sum(ServiceRequest.rating),
+        func.count(ServiceRequest.rating)
     ).join(ServiceRequest, ServiceRequest.professional_id == User.id).filter(
         ServiceRequest.customer_id == customer_id,
         ServiceRequest.rating.isnot(None)
     ).group_by(User.fullname).all()
 
     # Convert data to renderable format
-    service_status_data = {
-        status: count for status, count in service_status_distribution
-    }
-    daily_service_data = {
-        str(date): count for date, count in daily_services
-    }
+    service_status_data = merge_counts(
+        dict(service_status_distribution),
+        archived_counts_by(ArchivedServiceRequest.status, customer_id=customer_id)
+    )
+    daily_service_data = merge_counts(
+        {str(date): count for date, count in daily_services},
+        {str(date): count for date, count in archived_counts_by(
+            func.date(ArchivedServiceRequest.created_at), since=thirty_days_ago, customer_id=customer_id
+        ).items()}
+    )
+    ratings = {name: (rating_sum, rating_count) for name, rating_sum, rating_count in professional_ratings}
+    for name, (rating_sum, rating_count) in archived_ratings_by(
+            ArchivedServiceRequest.professional_name, customer_id=customer_id).items():
+        live_sum, live_count = ratings.get(name, (0, 0))
+        ratings[name] = (live_sum + rating_sum, live_count + rating_count)
     professional_ratings_data = {
-        name: round(avg_rating, 2) for name, avg_rating in professional_ratings
+        name: round(rating_sum / rating_count, 2) for name, (rating_sum, rating_count) in ratings.items()
     }
 
     # Data for template
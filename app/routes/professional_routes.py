@@ -1,51 +1,57 @@
 # Define blueprints for modular routes
-from flask import Blueprint, flash, redirect, render_template, request, url_for
+from flask import Blueprint, flash, jsonify, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
-from sqlalchemy import and_
-from app.models import RejectedRequest, Service, ServiceCategory, ServiceRequest, User
+from app.models import ArchivedServiceRequest, RejectedRequest, Service, ServiceCategory, ServiceRequest, User
 from app import db
+from app.archive import archived_count, archived_counts_by, archived_sums_by, merge_counts
+from app.bulk import accept_requests, parse_ids, reject_requests, summarize
+from app.events import record_event, transition
+from app.idempotency import idempotent
+from app.routing import replica_reads
+from app.viewmodels import request_rows
 
 professional_bp = Blueprint('professional', __name__, url_prefix='/professional')
 
 # Professional Dashboard Route
 @professional_bp.route('/dashboard')
 @login_required
+@replica_reads
 def professional_dashboard():
     if current_user.user_type != 'professional':
         flash('Access denied.', 'danger')
         return redirect(url_for('auth.login'))
 
     # Subquery for rejected requests by this professional
-    rejected_subquery = db.session.query(RejectedRequest.request_id).filter(
+    rejected_subquery = db.select(RejectedRequest.request_id).where(
         RejectedRequest.professional_id == current_user.id
-    ).subquery()
+    )
 
+    # Listings are read-only: select just the displayed columns into lightweight rows
     # Fetch available service requests (same category, not rejected or accepted)
-    available_requests = ServiceRequest.query.join(Service).filter(
-        and_(
-            Service.category_id == current_user.service_category_id,
-            ServiceRequest.status == 'requested',
-            ServiceRequest.id.not_in(rejected_subquery),
-            ServiceRequest.professional_id == None
-        )
-    ).all()
+    available_requests = request_rows(
+        Service.category_id == current_user.service_category_id,
+        ServiceRequest.status == 'requested',
+        ServiceRequest.id.not_in(rejected_subquery),
+        ServiceRequest.professional_id == None,
+        order_by=ServiceRequest.id
+    )
 
     # Fetch accepted or in-progress requests for this professional
-    accepted_requests = ServiceRequest.query.filter(
+    accepted_requests = request_rows(
         ServiceRequest.professional_id == current_user.id,
-        ServiceRequest.status.in_(['accepted', 'in_progress'])
-    ).all()
+        ServiceRequest.status.in_(['accepted', 'in_progress']),
+        order_by=ServiceRequest.id
+    )
 
     # Fetch closed or completed services for this professional
-    closed_services = ServiceRequest.query.filter(
+    closed_services = request_rows(
         ServiceRequest.professional_id == current_user.id,
-        ServiceRequest.status.in_(['completed', 'closed'])
-    ).all()
+        ServiceRequest.status.in_(['completed', 'closed']),
+        order_by=ServiceRequest.id
+    )
 
     # Fetch rejected requests for this professional
-    rejected_requests = ServiceRequest.query.join(RejectedRequest).filter(
-        RejectedRequest.professional_id == current_user.id
-    ).all()
+    rejected_requests = request_rows(ServiceRequest.id.in_(rejected_subquery), order_by=ServiceRequest.id)
 
     return render_template(
         'professional/dashboard.html',
@@ -59,6 +65,7 @@ def professional_dashboard():
 
 # Accept Request Route
 @professional_bp.route('/accept_request/<int:request_id>', methods=['POST'])
+@idempotent
 @login_required
 def accept_request(request_id):
     if current_user.user_type != 'professional':
@@ -75,8 +82,10 @@ def accept_request(request_id):
 
     # Assign the request to the professional
     service_request.professional_id = current_user.id
-    service_request.status = 'accepted'
+    transition(service_request, 'accepted', current_user.id)
     db.session.commit()
+    from app.recommendations import note_transition  # Deferred: pulls in numpy
+    note_transition(current_user, workload=1, accepted=1)
 
     flash('You have successfully accepted the request.', 'success')
     return redirect(url_for('professional.professional_dashboard'))
@@ -84,6 +93,7 @@ def accept_request(request_id):
 
 # Reject Request Route
 @professional_bp.route('/reject_request/<int:request_id>', methods=['POST'])
+@idempotent
 @login_required
 def reject_request(request_id):
     if current_user.user_type != 'professional':
@@ -101,11 +111,40 @@ def reject_request(request_id):
     # Add the rejection to the RejectedRequest table
     rejection = RejectedRequest(request_id=request_id, professional_id=current_user.id)
     db.session.add(rejection)
+    record_event(service_request, 'rejected', service_request.status, service_request.status, current_user.id)
     db.session.commit()
+    from app.recommendations import note_transition
+    note_transition(current_user, rejections=1)
 
     flash('You have rejected the request.', 'success')
     return redirect(url_for('professional.professional_dashboard'))
 
+
+# Accept or reject many available requests at once
+@professional_bp.route('/requests/bulk', methods=['POST'])
+@idempotent
+@login_required
+def bulk_requests():
+    if current_user.user_type != 'professional':
+        flash('Access denied.', 'danger')
+        return redirect(url_for('auth.login'))
+
+    actions = {'accept': (accept_requests, 'accepted'), 'reject': (reject_requests, 'rejected')}
+    action = request.form.get('action')
+    request_ids = parse_ids(request.form.getlist('request_ids'))
+    if action not in actions or not request_ids:
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify({'error': 'Choose an action and at least one request.'}), 400
+        flash('Choose an action and at least one request.', 'warning')
+        return redirect(url_for('professional.professional_dashboard'))
+
+    apply, done = actions[action]
+    results = apply(current_user, request_ids)
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({'results': results})
+    flash(f'Requests: {summarize(results, done)}.', 'success')
+    return redirect(url_for('professional.professional_dashboard'))
+
 from flask import request
 
 @professional_bp.route('/search', methods=['GET', 'POST'])
@@ -136,9 +175,10 @@ def professional_search():
                 ServiceRequest.professional_id == current_user.id
             ).all()
         elif search_criteria == 'pin_code':
-            # Search by customer pin code (specifying the 'customer_id' foreign key)
+            from app.geo import nearby_pin_codes
+            # Search by customers located near the pin code (specifying the 'customer_id' foreign key)
             search_results = ServiceRequest.query.join(User, ServiceRequest.customer_id == User.id).filter(
-                User.pin_code.like(f'%{search_term}%'),
+                User.pin_code.in_(nearby_pin_codes(search_term, request.form.get('radius_km', type=float))),
                 ServiceRequest.professional_id == current_user.id
             ).all()
 
@@ -150,6 +190,7 @@ from sqlalchemy import func
 
 @professional_bp.route('/summary', methods=['GET'])
 @login_required
+@replica_reads
 def professional_summary():
     if not current_user.is_professional:
         return "Unauthorized", 403
@@ -158,7 +199,7 @@ def professional_summary():
     total_services = ServiceRequest.query.filter(
         ServiceRequest.professional_id == current_user.id,
         ServiceRequest.status.in_(['completed', 'closed'])
-    ).count()
+    ).count() + archived_count(professional_id=current_user.id)
 
     # Daily earnings (only completed or closed services)
     earnings_data = db.session.query(
@@ -169,19 +210,17 @@ def professional_summary():
         ServiceRequest.status.in_(['completed', 'closed'])
     ).group_by('day').order_by('day').all()
 
-    earnings_labels = [row.day for row in earnings_data]
-    earnings_values = [row.total_earnings for row in earnings_data]
-
-    # Ratings distribution
-    rating_data = db.session.query(
-        ServiceRequest.rating, db.func.count(ServiceRequest.id)
-    ).filter(
-        ServiceRequest.professional_id == current_user.id,
-        ServiceRequest.rating.isnot(None)
-    ).group_by(ServiceRequest.rating).all()
+    earnings = merge_counts(dict(earnings_data), archived_sums_by(
+        db.func.date(ArchivedServiceRequest.completed_at), ArchivedServiceRequest.base_price,
+        professional_id=current_user.id
+    ))
+    earnings_labels = sorted(earnings, key=lambda day: day or '')
+    earnings_values = [earnings[day] for day in earnings_labels]
 
-    rating_labels = [str(row.rating) for row in rating_data]
-    rating_counts = [row[1] for row in rating_data]
+    # Ratings distribution (maintained incrementally on the user row)
+    rating_histogram = {stars: count for stars, count in current_user.rating_histogram.items() if count}
+    rating_labels = [str(stars) for stars in rating_histogram]
+    rating_counts = list(rating_histogram.values())
 
     # Service requests per service (all statuses, by category)
     service_data = db.session.query(
@@ -190,8 +229,11 @@ def professional_summary():
         Service.category_id == current_user.service_category_id
     ).group_by(Service.id).all()
 
-    service_labels = [row.name for row in service_data]
-    service_counts = [row[1] for row in service_data]
+    service_data = merge_counts(dict(service_data), archived_counts_by(
+        ArchivedServiceRequest.service_name, category_id=current_user.service_category_id
+    ))
+    service_labels = list(service_data)
+    service_counts = list(service_data.values())
 
     return render_template(
         'professional/summary.html',
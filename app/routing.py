@@ -0,0 +1,112 @@
+import random
+import sqlite3
+import time
+from contextlib import closing
+from functools import wraps
+
+from flask import current_app, has_request_context, request
+from flask import session as flask_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import SQLAlchemyError
+
+# Flask session key holding the time until which this user's reads stay on the primary
+STICKY_KEY = '_read_primary_until'
+
+# How long a replica's "has the primary's schema" check is trusted before it is repeated
+REPLICA_CHECK_SECONDS = 60
+_replica_checks = {}  # Bind key -> (usable, checked at)
+
+
+class RoutingSession(Session):
+    """Session that sends reads from ``replica_reads`` views to a replica engine.
+
+    Replica engines are regular Flask-SQLAlchemy binds listed in
+    ``SQLALCHEMY_REPLICA_BINDS``. Flushes, and everything after the first
+    write in a session, always go to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        # Only primary-database reads move; models with their own bind (e.g. the archive) stay put
+        if bind is None and engine is self._db.engine and self.info.get('use_replica') \
+                and not self._flushing and not self.info.get('wrote'):
+            replica = self._replica()
+            if replica is not None:
+                return replica
+        return engine
+
+    def _replica(self):
+        # Pick one replica per session so a request sees a single consistent snapshot
+        if 'replica_key' not in self.info:
+            keys = [key for key in current_app.config['SQLALCHEMY_REPLICA_BINDS']
+                    if key in self._db.engines and _replica_usable(self._db, key)]
+            self.info['replica_key'] = random.choice(keys) if keys else None
+        key = self.info['replica_key']
+        return self._db.engines[key] if key is not None else None
+
+
+def _replica_usable(db, key):
+    # A replica that was never synced (or is unreachable) would fail every query: use the primary
+    usable, checked_at = _replica_checks.get(key, (False, 0))
+    if time.monotonic() - checked_at > REPLICA_CHECK_SECONDS:
+        try:
+            with db.engines[key].connect() as connection:
+                usable = set(db.metadatas[None].tables) <= set(inspect(connection).get_table_names())
+        except SQLAlchemyError:
+            usable = False
+        _replica_checks[key] = (usable, time.monotonic())
+    return usable
+
+
+def sync_replicas(db):
+    """Copy the primary SQLite database over each file-based replica; returns a line per replica."""
+    keys = current_app.config['SQLALCHEMY_REPLICA_BINDS']
+    if not keys:
+        return []
+    primary = db.engines[None].url
+    if primary.get_backend_name() != 'sqlite':
+        raise ValueError('Only SQLite primaries can be copied locally.')
+    synced = []
+    for key in keys:
+        replica = db.engines[key].url
+        if replica.get_backend_name() != 'sqlite':
+            synced.append(f'Skipping {key}: not a SQLite database.')
+            continue
+        # The backup API copies a consistent snapshot even while the primary is being written
+        with closing(sqlite3.connect(primary.database)) as source, \
+                closing(sqlite3.connect(replica.database)) as target:
+            source.backup(target)
+        _replica_checks.pop(key, None)
+        synced.append(f'Copied {primary.database} to replica {key} ({replica.database}).')
+    return synced
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_written(session, flush_context):
+    session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _mark_bulk_write(orm_execute_state):
+    # Bulk INSERT/UPDATE/DELETE statements bypass the flush but are writes all the same
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _stick_to_primary(session):
+    # Read-your-writes: after a user's own commit, keep their reads on the primary for a while.
+    # 'wrote' stays set, so the rest of this request reads from the primary too.
+    if session.info.get('wrote') and has_request_context() and current_app.config['SQLALCHEMY_REPLICA_BINDS']:
+        flask_session[STICKY_KEY] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+
+
+def replica_reads(view):
+    """Serve the GET/HEAD branch of ``view`` from a read replica, when one is configured."""
+    @wraps(view)
+    def decorated(*args, **kwargs):
+        if request.method in ('GET', 'HEAD') and flask_session.get(STICKY_KEY, 0) < time.time():
+            current_app.extensions['sqlalchemy'].session.info['use_replica'] = True
+        return view(*args, **kwargs)
+    return decorated
@@ -0,0 +1,33 @@
+import json
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import db
+from app.models import SummarySnapshot
+
+
+def get_snapshot(key, max_age_seconds):
+    snapshot = db.session.get(SummarySnapshot, key)
+    if snapshot is None or snapshot.computed_at < datetime.utcnow() - timedelta(seconds=max_age_seconds):
+        return None
+    return json.loads(snapshot.payload)
+
+
+def save_snapshot(key, payload):
+    db.session.merge(SummarySnapshot(key=key, payload=json.dumps(payload), computed_at=datetime.utcnow()))
+    db.session.commit()
+
+
+def admin_trend_data(days):
+    """Admin trend data from the snapshot the recompute_summaries job keeps fresh.
+
+    Falls back to computing it inline (and importing pandas) when no recent
+    snapshot exists, e.g. when the job runner is not running or for an
+    unusual ``days`` value.
+    """
+    trends = get_snapshot(f'admin_trends:{days}', current_app.config['ANALYTICS_SNAPSHOT_SECONDS'])
+    if trends is None:
+        from app.analytics import get_trends  # Deferred: pandas is only needed here
+        trends = get_trends(('admin',), days=days)
+    return trends
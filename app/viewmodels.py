@@ -0,0 +1,80 @@
+from collections import namedtuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+from app import db
+from app.models import Service, ServiceCategory, ServiceRequest, User
+
+# Read-only rows for the big dashboard listings. They expose the attribute names the templates
+# already use (request.service.name, user.service_category.name, ...), but are plain tuples:
+# no identity map entry, no change tracking, and shared nested refs instead of one object per row.
+NamedRef = namedtuple('NamedRef', ['id', 'name'])
+PersonRef = namedtuple('PersonRef', ['id', 'fullname'])
+RequestRow = namedtuple('RequestRow', [
+    'id', 'status', 'created_at', 'accepted_at', 'completed_at', 'updated_at', 'rating', 'review',
+    'service', 'customer', 'professional'
+])
+ProfessionalRow = namedtuple('ProfessionalRow', [
+    'id', 'email', 'fullname', 'address', 'pin_code', 'experience', 'status', 'service_category'
+])
+
+Customer = aliased(User)
+Professional = aliased(User)
+
+
+class _Interned(dict):
+    # Builds each nested ref once per listing, so 100k rows share a handful of service objects
+    def __init__(self, factory):
+        super().__init__()
+        self.factory = factory
+
+    def get_ref(self, key, *fields):
+        if key is None:
+            return None
+        ref = self.get(key)
+        if ref is None:
+            ref = self[key] = self.factory(key, *fields)
+        return ref
+
+
+def request_rows(*criteria, order_by=None):
+    """Service requests matching ``criteria`` as ``RequestRow`` tuples."""
+    query = select(
+        ServiceRequest.id, ServiceRequest.status, ServiceRequest.created_at, ServiceRequest.accepted_at,
+        ServiceRequest.completed_at, ServiceRequest.updated_at, ServiceRequest.rating, ServiceRequest.review,
+        Service.id, Service.name, Customer.id, Customer.fullname, Professional.id, Professional.fullname,
+    ).join(Service, ServiceRequest.service_id == Service.id) \
+        .join(Customer, ServiceRequest.customer_id == Customer.id) \
+        .outerjoin(Professional, ServiceRequest.professional_id == Professional.id) \
+        .where(*criteria)
+    if order_by is not None:
+        query = query.order_by(order_by)
+
+    services, people = _Interned(NamedRef), _Interned(PersonRef)
+    return [
+        RequestRow(
+            *row[:8],
+            services.get_ref(row[8], row[9]),
+            people.get_ref(row[10], row[11]),
+            people.get_ref(row[12], row[13]),
+        )
+        for row in db.session.execute(query)
+    ]
+
+
+def professional_rows(*criteria, order_by=None):
+    """Professionals matching ``criteria`` as ``ProfessionalRow`` tuples."""
+    query = select(
+        User.id, User.email, User.fullname, User.address, User.pin_code, User.experience, User.status,
+        ServiceCategory.id, ServiceCategory.name,
+    ).outerjoin(ServiceCategory, User.service_category_id == ServiceCategory.id) \
+        .where(User.user_type == 'professional', *criteria)
+    if order_by is not None:
+        query = query.order_by(order_by)
+
+    categories = _Interned(NamedRef)
+    return [
+        ProfessionalRow(*row[:7], categories.get_ref(row[7], row[8]))
+        for row in db.session.execute(query)
+    ]
@@ -0,0 +1,7 @@
+from app import create_app
+from app.asgi import create_asgi_app
+from config import ServingConfig
+
+# Production entry point: uvicorn asgi:app --workers 4
+# Dashboards, summaries and feeds under /async run on async sessions; all other routes are the Flask app.
+app = create_asgi_app(create_app(ServingConfig))
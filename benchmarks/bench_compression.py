@@ -0,0 +1,111 @@
+# Bytes on the wire and time to first byte for the admin dashboard, per Accept-Encoding.
+# Usage: python benchmarks/bench_compression.py [requests in the table] [fetches per encoding] [link Mbit/s]
+#
+# Loopback has no bandwidth limit, so the last column adds the transfer time the body would
+# take over a link of the given speed (default 50 Mbit/s) to the measured time to first byte.
+import http.client
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.serving import WSGIRequestHandler, make_server  # noqa: E402
+
+from config import Config  # noqa: E402
+
+
+def make_app(path):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+        INIT_MIGRATIONS = False
+        RATELIMIT_ENABLED = False
+        BCRYPT_LOG_ROUNDS = 4
+
+    from app import create_app
+    return create_app(BenchConfig)
+
+
+def seed(app, rows):
+    from app import bcrypt, db
+    from app.models import Service, ServiceCategory, ServiceRequest, User
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(email='admin@example.com', user_type='admin', fullname='Admin',
+                            password=bcrypt.generate_password_hash('admin').decode('utf-8')))
+        db.session.execute(db.insert(ServiceCategory), [{'id': i, 'name': f'Category {i}'} for i in range(1, 6)])
+        db.session.execute(db.insert(Service), [
+            {'id': i, 'name': f'Service {i}', 'description': 'd', 'base_price': 100 + i, 'category_id': i % 5 + 1}
+            for i in range(1, 21)
+        ])
+        db.session.execute(db.insert(User), [
+            {'email': f'user{i}@example.com', 'password': 'x', 'fullname': f'User {i}', 'status': 'approved',
+             'user_type': 'customer' if i < 400 else 'professional', 'service_category_id': i % 5 + 1}
+            for i in range(1, 501)
+        ])
+        now = datetime.utcnow()
+        db.session.execute(db.insert(ServiceRequest), [
+            {'customer_id': i % 398 + 2, 'service_id': i % 20 + 1, 'professional_id': 401 + i % 100,
+             'status': 'closed', 'created_at': now - timedelta(minutes=i)}
+            for i in range(rows)
+        ])
+        db.session.commit()
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def fetch(port, cookie, encoding):
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    started = time.perf_counter()
+    connection.request('GET', '/admin/dashboard', headers={'Cookie': cookie, 'Accept-Encoding': encoding})
+    response = connection.getresponse()  # Returns once the status line and headers have arrived
+    first_byte = time.perf_counter() - started
+    body = response.read()
+    total = time.perf_counter() - started
+    connection.close()
+    return first_byte, total, len(body), response.getheader('Content-Encoding') or 'identity'
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    fetches = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    mbps = float(sys.argv[3]) if len(sys.argv) > 3 else 50.0
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_app(os.path.join(directory, 'bench.db'))
+        seed(app, rows)
+        server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        port = server.server_port
+
+        connection = http.client.HTTPConnection('127.0.0.1', port)
+        connection.request('POST', '/login', body=urlencode({'email': 'admin@example.com', 'password': 'admin'}),
+                           headers={'Content-Type': 'application/x-www-form-urlencoded'})
+        response = connection.getresponse()
+        response.read()
+        cookie = response.getheader('Set-Cookie').split(';', 1)[0]
+
+        print(f'admin dashboard with {rows} requests, {fetches} fetches per encoding')
+        print(f'{"Accept-Encoding":<16} {"served as":<10} {"bytes":>10} {"TTFB p50":>10} {"total p50":>10} '
+              f'{"@" + format(mbps, "g") + "Mbit/s":>12}')
+        for encoding in ('identity', 'gzip', 'br'):
+            fetch(port, cookie, encoding)  # Warm-up
+            results = [fetch(port, cookie, encoding) for _ in range(fetches)]
+            first_byte = statistics.median(r[0] for r in results)
+            size = results[0][2]
+            print(f'{encoding:<16} {results[0][3]:<10} {size:>10} {first_byte * 1000:>8.1f}ms '
+                  f'{statistics.median(r[1] for r in results) * 1000:>8.1f}ms '
+                  f'{(first_byte + size * 8 / (mbps * 1e6)) * 1000:>10.1f}ms')
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
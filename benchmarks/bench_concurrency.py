@@ -0,0 +1,205 @@
+# Simultaneous professional-dashboard clients one server process sustains: the threaded
+# Werkzeug server (what run.py starts) side by side with the ASGI app (asgi.py under uvicorn).
+# Usage: python benchmarks/bench_concurrency.py [--clients 50 200 500] [--seconds 10] [--streams 300]
+#
+# Each server runs in its own process on a seeded temporary database. Every client polls its
+# dashboard in a loop until the run time is up, then waits for its last response; the table
+# reports throughput over that whole span, errors (including 60 s timeouts) and latency per
+# server and client count. The ASGI app is measured twice: through the unchanged
+# Flask view mounted via WsgiToAsgi, and through the native async /async endpoint (JSON rather
+# than HTML, from the same queries). --streams then holds that many SSE feeds open on the ASGI
+# app, which the threaded server has no equivalent for.
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+
+EMAIL, PASSWORD = 'pro@example.com', 'pro'
+
+
+def make_app(path):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+        INIT_MIGRATIONS = False
+        RATELIMIT_ENABLED = False
+        BCRYPT_LOG_ROUNDS = 4
+
+    from app import create_app
+    return create_app(BenchConfig)
+
+
+def seed(app, rows):
+    from app import bcrypt, db
+    from app.models import Service, ServiceCategory, ServiceRequest, User
+
+    with app.app_context():
+        db.create_all()
+        db.session.execute(db.insert(ServiceCategory), [{'id': i, 'name': f'Category {i}'} for i in range(1, 6)])
+        db.session.execute(db.insert(Service), [
+            {'id': i, 'name': f'Service {i}', 'description': 'd', 'base_price': 100 + i, 'category_id': i % 5 + 1}
+            for i in range(1, 21)
+        ])
+        db.session.add(User(id=1, email=EMAIL, user_type='professional', fullname='Pro', status='approved',
+                            service_category_id=1, password=bcrypt.generate_password_hash(PASSWORD).decode('utf-8')))
+        db.session.execute(db.insert(User), [
+            {'id': i, 'email': f'user{i}@example.com', 'password': 'x', 'fullname': f'User {i}',
+             'user_type': 'customer'}
+            for i in range(2, 402)
+        ])
+        # Open requests are unique per (customer, service): one per pair, the rest closed by the professional
+        now = datetime.utcnow()
+        db.session.execute(db.insert(ServiceRequest), [
+            {'customer_id': i % 400 + 2, 'service_id': i // 400 % 20 + 1,
+             'status': 'requested' if i < 8000 and i % 3 else 'closed',
+             'professional_id': None if i < 8000 and i % 3 else 1,
+             'created_at': now - timedelta(minutes=i)}
+            for i in range(rows)
+        ])
+        db.session.commit()
+
+
+def serve(mode, path, port):
+    app = make_app(path)
+    if mode == 'threaded':
+        from werkzeug.serving import WSGIRequestHandler, make_server
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_request(self, *args, **kwargs):
+                pass
+
+        make_server('127.0.0.1', port, app, threaded=True, request_handler=QuietHandler).serve_forever()
+    else:
+        import uvicorn
+        from app.asgi import create_asgi_app
+        uvicorn.run(create_asgi_app(app), host='127.0.0.1', port=port, log_level='warning', backlog=4096)
+
+
+def start(mode, path):
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', mode, path, str(port)])
+    for _ in range(200):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            return process, f'http://127.0.0.1:{port}'
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f'{mode} server did not start')
+
+
+async def login(base_url):
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        await client.post('/login', data={'email': EMAIL, 'password': PASSWORD})
+        return dict(client.cookies)
+
+
+REQUEST_TIMEOUT = 60
+
+
+async def poll(client, path, deadline, latencies, errors):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.get(path)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+        except httpx.HTTPError:
+            errors.append(1)
+
+
+async def load(base_url, cookies, path, clients, seconds):
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, cookies=cookies, limits=limits,
+                                 timeout=httpx.Timeout(REQUEST_TIMEOUT)) as client:
+        await client.get(path)  # Warm-up
+        latencies, errors = [], []
+        started = time.perf_counter()
+        await asyncio.gather(*(poll(client, path, started + seconds, latencies, errors) for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+    return np.array(latencies) * 1000, len(errors), elapsed
+
+
+async def hold_streams(base_url, cookies, path, clients, seconds):
+    # A client counts as held once the server has started streaming to it
+    held, errors = [], []
+
+    async def hold(client):
+        try:
+            async with client.stream('GET', path) as response:
+                response.raise_for_status()
+                async for _ in response.aiter_raw():
+                    held.append(1)
+                    await asyncio.Event().wait()
+        except httpx.HTTPError:
+            errors.append(1)
+
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, cookies=cookies, limits=limits,
+                                 timeout=httpx.Timeout(seconds)) as client:
+        tasks = [asyncio.create_task(hold(client)) for _ in range(clients)]
+        await asyncio.sleep(seconds)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return len(held), len(errors)
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--serve':
+        serve(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+        return
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, nargs='+', default=[50, 200, 500])
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--rows', type=int, default=2_000)
+    parser.add_argument('--streams', type=int, default=300)
+    args = parser.parse_args()
+
+    targets = [
+        ('threaded', 'threaded', '/professional/dashboard'),
+        ('ASGI, Flask view', 'asgi', '/professional/dashboard'),
+        ('ASGI, /async', 'asgi', '/async/professional/dashboard'),
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.db')
+        seed(make_app(path), args.rows)
+        servers = {mode: start(mode, path) for mode in ('threaded', 'asgi')}
+        cookies = {mode: asyncio.run(login(url)) for mode, (_, url) in servers.items()}
+        try:
+            print(f'professional dashboard, {args.rows} requests, {args.seconds:g}s per run, {os.cpu_count()} CPU(s)')
+            print(f'{"server":<18} {"clients":>7} {"req/s":>8} {"errors":>7} {"p50 ms":>9} {"p95 ms":>9}')
+            for clients in args.clients:
+                for label, mode, route in targets:
+                    latencies, errors, elapsed = asyncio.run(
+                        load(servers[mode][1], cookies[mode], route, clients, args.seconds)
+                    )
+                    p50, p95 = np.percentile(latencies, [50, 95]) if len(latencies) else (float('nan'),) * 2
+                    print(f'{label:<18} {clients:>7} {len(latencies) / elapsed:>8.1f} {errors:>7} '
+                          f'{p50:>9.1f} {p95:>9.1f}')
+            if args.streams:
+                held, errors = asyncio.run(hold_streams(servers['asgi'][1], cookies['asgi'],
+                                                        '/async/professional/feed', args.streams, args.seconds))
+                print(f'ASGI SSE feed: {held} of {args.streams} streams held, {errors} errors')
+        finally:
+            for process, _ in servers.values():
+                process.terminate()
+                process.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+# Times top-k professional recommendation over a synthetic category, and the background rebuild
+# (build_candidates) that produces its arrays from a seeded SQLite database of the same size.
+# Usage: python benchmarks/bench_recommendations.py [professionals] [queries] [requests per professional]
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.recommendations import CategoryCandidates  # noqa: E402
+from config import Config  # noqa: E402
+
+WEIGHTS = {'proximity': 0.4, 'rating': 0.3, 'workload': 0.2, 'reliability': 0.1}
+
+
+def seed(app, size, per_professional, rng):
+    from app import db
+    from app.models import (
+        ArchivedRejection, ArchivedServiceRequest, RejectedRequest, Service, ServiceCategory, ServiceRequest, User
+    )
+
+    customers = 1_000
+    now = datetime.utcnow()
+    with app.app_context():
+        db.create_all()
+        db.session.execute(db.insert(ServiceCategory), [{'id': 1, 'name': 'Category 1'}])
+        db.session.execute(db.insert(Service), [
+            {'id': i, 'name': f'Service {i}', 'description': 'd', 'base_price': 100, 'category_id': 1}
+            for i in range(1, 21)
+        ])
+        db.session.execute(db.insert(User), [
+            {'id': i, 'email': f'customer{i}@example.com', 'password': 'x', 'fullname': f'Customer {i}',
+             'user_type': 'customer'}
+            for i in range(1, customers + 1)
+        ])
+        pins, ratings = rng.integers(110001, 855117, size), rng.integers(0, 200, size)
+        db.session.execute(db.insert(User), [
+            {'id': customers + i + 1, 'email': f'professional{i}@example.com', 'password': 'x',
+             'fullname': f'Professional {i}', 'user_type': 'professional', 'status': 'approved',
+             'service_category_id': 1, 'pin_code': str(pins[i]),
+             'rating_count': int(ratings[i]), 'rating_sum': int(ratings[i]) * 4}
+            for i in range(size)
+        ])
+        # Mostly closed history; open ones are unique per (customer, service) like the real index demands
+        total = size * per_professional
+        db.session.execute(db.insert(ServiceRequest), [
+            {'id': i + 1, 'customer_id': i % customers + 1, 'service_id': i // customers % 20 + 1,
+             'professional_id': customers + i % size + 1,
+             'status': 'accepted' if i < customers * 20 else 'closed', 'created_at': now}
+            for i in range(total)
+        ])
+        db.session.execute(db.insert(RejectedRequest), [
+            {'request_id': i + 1, 'professional_id': customers + (i * 7) % size + 1} for i in range(0, total, 3)
+        ])
+        db.session.commit()  # The archive bind is its own engine on the same file
+        db.session.execute(db.insert(ArchivedServiceRequest), [
+            {'id': total + i + 1, 'customer_id': i % customers + 1, 'service_id': 1, 'status': 'closed',
+             'professional_id': customers + i % size + 1, 'category_id': 1}
+            for i in range(total)
+        ])
+        db.session.execute(db.insert(ArchivedRejection), [
+            {'request_id': total + i + 1, 'professional_id': customers + (i * 7) % size + 1}
+            for i in range(0, total, 3)
+        ])
+        db.session.commit()
+    return total
+
+
+def time_rebuild(size, per_professional, rng, runs=5):
+    from app import create_app
+    from app.recommendations import build_candidates
+
+    with tempfile.TemporaryDirectory() as directory:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.join(directory, "bench.db")}'
+            INIT_MIGRATIONS = False
+
+        app = create_app(BenchConfig)
+        total = seed(app, size, per_professional, rng)
+        timings = []
+        with app.app_context():
+            for _ in range(runs):
+                started = time.perf_counter()
+                candidates = build_candidates(1)
+                timings.append((time.perf_counter() - started) * 1000)
+            assert len(candidates.ids) == size
+    return total, np.array(timings)
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+    per_professional = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    rng = np.random.default_rng(42)
+
+    counts = rng.integers(0, 200, size)
+    started = time.perf_counter()
+    candidates = CategoryCandidates(
+        ids=np.arange(1, size + 1),
+        names=[f'Professional {i}' for i in range(size)],
+        pins=rng.integers(110001, 855117, size),
+        rating_sum=counts * rng.uniform(1, 5, size),
+        rating_count=counts,
+        workload=rng.integers(0, 6, size),
+        rejections=rng.integers(0, 30, size),
+        accepted=rng.integers(0, 300, size),
+        latitudes=np.radians(rng.uniform(8, 35, size)),
+        longitudes=np.radians(rng.uniform(68, 97, size)),
+    )
+    build_ms = (time.perf_counter() - started) * 1000
+
+    pins = [str(pin) for pin in rng.integers(110001, 855117, queries)]
+    origin = (np.radians(28.63), np.radians(77.22))
+    timings = []
+    for pin in pins:
+        started = time.perf_counter()
+        candidates.top(pin, WEIGHTS, 5, origin=origin)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    timings = np.array(timings)
+    print(f'professionals: {size}, queries: {queries}')
+    print(f'build (from arrays): {build_ms:.2f} ms')
+    print(f'top-5 latency: p50 {np.percentile(timings, 50):.3f} ms, '
+          f'p95 {np.percentile(timings, 95):.3f} ms, max {timings.max():.3f} ms')
+
+    # Off the request path: a booking only queues it and keeps serving the previous arrays
+    total, rebuilds = time_rebuild(size, per_professional, rng)
+    print(f'rebuild (build_candidates, {total} live + {total} archived requests): '
+          f'p50 {np.percentile(rebuilds, 50):.0f} ms, max {rebuilds.max():.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
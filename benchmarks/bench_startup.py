@@ -0,0 +1,63 @@
+# Measures cold-start cost of the WSGI entry point: import time and time to first request.
+# Usage: python benchmarks/bench_startup.py [runs] [module ...]   (default: run wsgi)
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_REQUEST = """
+import time
+started = time.perf_counter()
+from {module} import app
+imported = time.perf_counter()
+app.test_client().get('/login')
+done = time.perf_counter()
+print(f'{{(imported - started) * 1000:.1f}} {{(done - started) * 1000:.1f}}')
+"""
+
+
+def import_profile(module):
+    # -X importtime writes "self | cumulative | name" lines to stderr
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT, capture_output=True, text=True)
+    total, rows = 0, []
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)', line)
+        if not match:
+            continue
+        depth = len(match.group(3)) // 2
+        if match.group(4) == module:
+            total = int(match.group(2))
+        elif 1 <= depth <= 2:
+            rows.append((int(match.group(2)), match.group(4)))
+    return total, sorted(rows, reverse=True)
+
+
+def first_request(module):
+    result = subprocess.run([sys.executable, '-c', FIRST_REQUEST.format(module=module)],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    imported, served = result.stdout.split()
+    return float(imported), float(served)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    modules = sys.argv[2:] or ['run', 'wsgi']
+
+    for module in modules:
+        total, rows = import_profile(module)
+        print(f'`import {module}`: {total / 1000:.1f} ms; heaviest dependencies (cumulative ms):')
+        for cumulative, name in rows[:8]:
+            print(f'  {cumulative / 1000:8.1f}  {name}')
+
+        samples = [first_request(module) for _ in range(runs)]
+        print(f'  over {runs} runs: import {statistics.median(s[0] for s in samples):.1f} ms, '
+              f'first request served at {statistics.median(s[1] for s in samples):.1f} ms (median)')
+        print()
+
+
+if __name__ == '__main__':
+    main()
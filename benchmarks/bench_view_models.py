@@ -0,0 +1,94 @@
+# Memory and time to load a dashboard-sized request listing as ORM objects vs. view-model rows.
+# Usage: python benchmarks/bench_view_models.py [rows]   (default: 100000)
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+
+
+def make_app(path):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+        INIT_MIGRATIONS = False
+        RATELIMIT_ENABLED = False
+
+    from app import create_app
+    return create_app(BenchConfig)
+
+
+def seed(db, rows):
+    from app.models import Service, ServiceCategory, ServiceRequest, User
+
+    db.create_all()
+    db.session.execute(db.insert(ServiceCategory), [{'id': i, 'name': f'Category {i}'} for i in range(1, 11)])
+    db.session.execute(db.insert(Service), [
+        {'id': i, 'name': f'Service {i}', 'description': 'd', 'base_price': 100 + i, 'category_id': i % 10 + 1}
+        for i in range(1, 51)
+    ])
+    db.session.execute(db.insert(User), [
+        {'id': i, 'email': f'user{i}@example.com', 'password': 'x',
+         'user_type': 'customer' if i <= 2000 else 'professional', 'fullname': f'User {i}'}
+        for i in range(1, 2501)
+    ])
+    now = datetime.utcnow()
+    db.session.execute(db.insert(ServiceRequest), [
+        {'customer_id': i % 2000 + 1, 'service_id': i % 50 + 1, 'professional_id': 2001 + i % 500,
+         'status': 'closed', 'created_at': now - timedelta(minutes=i), 'updated_at': now,
+         'completed_at': now, 'rating': i % 5 + 1}
+        for i in range(rows)
+    ])
+    db.session.commit()
+
+
+def measure(label, load, rows, reset):
+    # Timed without tracemalloc (it slows allocation-heavy code several times over), then traced
+    gc.collect()
+    started = time.perf_counter()
+    load()
+    elapsed = time.perf_counter() - started
+    reset()
+
+    gc.collect()
+    tracemalloc.start()
+    listing = load()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del listing
+    reset()
+    print(f'{label:<12} {elapsed * 1000:8.0f} ms  {current / rows:8.0f} B/row retained  '
+          f'{peak / rows:8.0f} B/row peak')
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_app(os.path.join(directory, 'bench.db'))
+        from app import db
+        from app.models import ServiceRequest
+        from app.viewmodels import request_rows
+
+        with app.app_context():
+            seed(db, rows)
+            print(f'rows: {rows}')
+
+            def orm():
+                # What the dashboard did: full entities, plus the relationships the template touches
+                listing = ServiceRequest.query.order_by(ServiceRequest.id).all()
+                for service_request in listing:
+                    service_request.service.name, service_request.customer.fullname
+                    service_request.professional.fullname
+                return listing
+
+            measure('ORM', orm, rows, db.session.remove)
+            measure('view model', lambda: request_rows(order_by=ServiceRequest.id), rows, db.session.remove)
+
+
+if __name__ == '__main__':
+    main()
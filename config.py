@@ -5,5 +5,76 @@ class Config:
     SECRET_KEY = 'your-secret-key-here'
     SQLALCHEMY_DATABASE_URI = 'sqlite:///site.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {'pool_pre_ping': True}  # Drop connections that died across a fork
+    # Archived requests live in the main database unless an 'archive' bind points them at another file
+    SQLALCHEMY_BINDS = {}
+    INIT_MIGRATIONS = True  # Registers the `flask db` commands
+
+    # Read replicas: add them to SQLALCHEMY_BINDS, e.g. 'replica': 'sqlite:///site-replica.db',
+    # and list their keys here. Views marked with @replica_reads then read from one of them.
+    SQLALCHEMY_REPLICA_BINDS = []
+    REPLICA_STICKY_SECONDS = 10  # Reads stay on the primary this long after a user's own write
     PERMANENT_SESSION_LIFETIME = timedelta(minutes=30)
-    UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
\ No newline at end of file
+    UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+    ANALYTICS_CACHE_SECONDS = 300  # How long computed trend charts are reused
+    # Admin trend ranges the recompute_summaries job precomputes, and how long a snapshot stays usable
+    ANALYTICS_SNAPSHOT_DAYS = [90, 365]
+    ANALYTICS_SNAPSHOT_SECONDS = 900
+
+    # Professional recommendations at booking time
+    RECOMMENDATION_TOP_K = 3
+    RECOMMENDATION_REFRESH_SECONDS = 60  # Rebuild per-category candidate arrays after this long
+    RECOMMENDATION_WEIGHTS = {'proximity': 0.4, 'rating': 0.3, 'workload': 0.2, 'reliability': 0.1}
+
+    # Pin code locality lookups
+    PINCODE_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app', 'data', 'pincodes.csv')
+    GEO_GRID_KM = 10  # Grid cell size of the in-memory pin code index
+    GEO_DEFAULT_RADIUS_KM = 10
+    GEO_MAX_RADIUS_KM = 100
+
+    # ASGI serving mode (asgi.py); the async URI defaults to the sync one with an async driver
+    ASYNC_SQLALCHEMY_DATABASE_URI = None
+    ASYNC_FEED_POLL_SECONDS = 5
+
+    # Archival of closed requests (flask archive-requests)
+    ARCHIVE_AFTER_DAYS = 180
+    ARCHIVE_BATCH_SIZE = 500
+
+    # Background maintenance jobs (flask run-jobs); see app/jobs.py for the registered jobs
+    JOB_POLL_SECONDS = 5
+    JOB_THREADS = 4
+    # Per-job overrides of interval_seconds, max_concurrency, timeout_seconds and enabled, e.g.
+    # {'vacuum_database': {'enabled': False}, 'expire_stale_requests': {'interval_seconds': 600}}
+    JOB_SCHEDULE = {}
+    STALE_REQUEST_DAYS = 30  # Requests nobody accepted within this long are marked 'expired'
+    REJECTED_UPLOAD_RETENTION_DAYS = 30  # Verification documents of rejected professionals are then deleted
+
+    # Response compression (gzip, plus brotli when the Brotli package is installed)
+    COMPRESS_MIN_SIZE = 1024  # Smaller bodies gain too little to be worth the CPU
+    COMPRESS_LEVEL = 3  # On the admin dashboard, levels above 3 roughly double the CPU for ~9% fewer bytes
+    COMPRESS_MIMETYPES = ['text/html', 'application/json', 'text/plain', 'text/css', 'text/javascript',
+                          'application/javascript', 'image/svg+xml']
+
+    # Idempotency keys on state-changing POSTs: responses are replayed for duplicates within the TTL
+    IDEMPOTENCY_TTL_SECONDS = 3600
+    IDEMPOTENCY_MAX_KEYS = 10000
+    IDEMPOTENCY_MAX_BODY_BYTES = 64 * 1024  # Larger responses are not kept; duplicates get a redirect to the page
+
+    # Token-bucket rate limits per endpoint, applied per client IP and per logged-in user.
+    # Format: '[METHODS] count/period'; the bucket holds `count` tokens and refills over `period`.
+    RATELIMIT_ENABLED = True
+    RATELIMIT_STORAGE_PATH = None  # SQLite file to share buckets between workers, e.g. '/tmp/ratelimit.db'
+    RATELIMITS = {
+        'auth.login': 'POST 10/minute',
+        'auth.customer_signup': 'POST 5/minute',
+        'auth.professional_signup': 'POST 5/minute',
+        'customer.book_service': 'POST 20/minute',
+        'customer.search': '60/minute',
+        'professional.professional_search': '60/minute',
+        'admin.admin_search': '60/minute',
+    }
+
+
+# Used by the production entry points (wsgi.py, asgi.py): skips Flask-Migrate at boot
+class ServingConfig(Config):
+    INIT_MIGRATIONS = False
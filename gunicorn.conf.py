@@ -0,0 +1,23 @@
+# gunicorn -c gunicorn.conf.py
+wsgi_app = 'wsgi:app'
+bind = '0.0.0.0:8000'
+workers = 4
+
+# Import the app (and its heavy modules) once in the master; workers share the pages copy-on-write
+preload_app = True
+
+
+def when_ready(server):
+    # Warm the lazily imported modules before forking so no worker pays for them on a request
+    import app.analytics  # noqa: F401
+    import app.geo  # noqa: F401
+    import app.recommendations  # noqa: F401
+
+
+def post_fork(server, worker):
+    # Pooled connections opened in the master must not be shared with the children
+    from wsgi import app
+    from app import db
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
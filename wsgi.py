@@ -0,0 +1,5 @@
+from app import create_app
+from config import ServingConfig
+
+# Production WSGI entry point: gunicorn -c gunicorn.conf.py
+app = create_app(ServingConfig)